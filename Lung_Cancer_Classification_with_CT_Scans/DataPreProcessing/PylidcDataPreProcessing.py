@@ -51,16 +51,21 @@ def extractPylidcFeatures(pylidcFeaturesFilename:str) -> pd.DataFrame:
     # Initialize the dataframe
     df = createPylidcInitialDataframe()
     
+    # Bulk load all the Scans (alongside their annotations, contours and z-values) and keep the first Scan of each Patient
+    patientScans = {}
+    for scan in pl.load_scans():
+        patientScans.setdefault(scan.patient_id, scan)
+
     # Fetch all the Patient Ids Available
-    patientIds = sorted(np.unique([scan.patient_id for scan in pl.query(pl.Scan).all()]))
+    patientIds = sorted(patientScans)
 
     # Creating a list to store all the patient's whose nodule's clustering failed
     failedClusterAnalysis = []
     
     # Iterate over all the patient Ids
     for patientId in patientIds:
-        # Get all the Scans associated with the current patient
-        patientScan = pl.query(pl.Scan).filter(pl.Scan.patient_id == patientId).first()
+        # Get the Scan associated with the current patient
+        patientScan = patientScans[patientId]
         
         try:
             # Debug: print scan ID and basic info
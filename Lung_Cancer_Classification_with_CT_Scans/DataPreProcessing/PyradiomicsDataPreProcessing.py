@@ -21,8 +21,13 @@ def refactorPyradiomicsDataset(df_pyradiomics:pd.DataFrame, pyradiomicsRefactore
     # Create a new empty dataframe for the refactored dataset
     df = pd.DataFrame(columns=cols)
 
+    # Bulk load all the Scans (alongside their annotations, contours and z-values) and keep the first Scan of each Patient
+    patientScans = {}
+    for scan in pl.load_scans():
+        patientScans.setdefault(scan.patient_id, scan)
+
     # Fetch all the Patient Ids Available
-    patientIds = sorted(np.unique([scan.patient_id for scan in pl.query(pl.Scan).all()]))
+    patientIds = sorted(patientScans)
 
     # Iterate over all the patient Ids
     for patientId in patientIds:
@@ -30,7 +35,7 @@ def refactorPyradiomicsDataset(df_pyradiomics:pd.DataFrame, pyradiomicsRefactore
             print(f"\n-> [NEW PATIENT: {patientId}]\n")
         
         # Fetch the patient's scan
-        patientScan = pl.query(pl.Scan).filter(pl.Scan.patient_id == patientId).first()
+        patientScan = patientScans[patientId]
 
         # Creating a mask to filter the current patient data from the pyradiomics dataframe
         mask = df_pyradiomics[df_pyradiomics.columns[0]].str.contains(patientId)
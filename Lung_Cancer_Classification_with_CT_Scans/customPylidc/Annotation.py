@@ -3,33 +3,19 @@ import sqlalchemy as sq
 from sqlalchemy.orm import relationship
 from ._Base import Base
 from .Scan import Scan
+from .contour_store import get_contour_store
+from .dicom_pixels import slice_pixels
+from .geometry import get_marching_cubes, fill_polygons, max_chords, \
+                      shoelace_areas, polygon_measures, slab_thicknesses, \
+                      mask_surface_area, linear_weights, interp_axis, \
+                      grid_axes
+from ._memo import memoized_property, memoized_method, clear as _clear_memo
 
 import numpy as np
-import matplotlib.pyplot as plt
 
-# For contour to boolean mask function.
-import matplotlib.path as mplpath
-
-# For CT volume visualizer.
-from matplotlib.patches import Rectangle
-from matplotlib.widgets import Slider, Button, CheckButtons
-
-# For diameter estimation.
-from scipy.spatial.distance import pdist,squareform
-from scipy.interpolate import RegularGridInterpolator
-
-# For 3D visualizer.
-from skimage.measure import mesh_surface_area
-
-try:
-    from skimage.measure import marching_cubes
-except ImportError:
-    # Old version compatible since marching_cubes replaced with marchin_cubes_lewiner in skimage 0.19.0
-    from skimage.measure import marching_cubes_lewiner as marching_cubes
-from mpl_toolkits.mplot3d import Axes3D
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-from scipy.spatial import Delaunay
-from scipy.ndimage import distance_transform_edt as dtrans
+# NOTE: The plotting (matplotlib), 3D (mpl_toolkits, skimage) and scipy 
+# dependencies are imported inside the methods that use them, so that 
+# importing pylidc stays cheap for headless batch jobs.
 
 
 feature_names = \
@@ -193,6 +179,17 @@ class Annotation(Base):
         else:
             super(Annotation,self).__setattr__(name,value)
 
+    def clear_cache(self):
+        """
+        Drop the memoized derived quantities of the annotation 
+        (`contours_matrix`, `centroid`, `bbox`, `diameter`, `volume`, ...). 
+        These are computed once per object and then kept for as long
+        as the object lives (each access returns a copy of the memoized
+        arrays); the hit/miss counters are available via
+        `pylidc.geometry_cache_info()`.
+        """
+        _clear_memo(self)
+
     ####################################
     # { Begin semantic attribute functions
 
@@ -340,6 +337,7 @@ class Annotation(Base):
             print('%-18s | %-24s | %-2d'%(fnames[i].title(), 
                                           fstrings[i], fvals[i]))
 
+    @memoized_method
     def bbox(self, pad=None):
         """
         Returns a tuple of Python `slice` objects that can be used to index
@@ -482,6 +480,7 @@ class Annotation(Base):
                 slice(kmin,kmax+1))
 
 
+    @memoized_method
     def bbox_dims(self, pad=None):
         """
         Return the physical dimensions of the nodule bounding box in 
@@ -517,6 +516,7 @@ class Annotation(Base):
                             for r,b in zip(res, self.bbox(pad=pad))])
 
 
+    @memoized_method
     def bbox_matrix(self, pad=None):
         """
         The `bbox` function returns a tuple of slices to be used to index
@@ -560,8 +560,49 @@ class Annotation(Base):
         """
         return np.array([[sl.start, sl.stop-1] for sl in self.bbox(pad=pad)])
 
+    def roi_volume(self, pad=None, verbose=False, **kwargs):
+        """
+        Return the part of the scan volume inside the (padded) bounding
+        box of the annotation. Only the slices of the bounding box are
+        read from the DICOM files.
 
-    @property
+        Parameters
+        ----------
+        pad: int, list, or float, default=None
+            See :meth:`pylidc.Annotation.bbox` for a 
+            description of this argument.
+
+        verbose: bool, default=False
+            Turn the loading statement on/off.
+
+        Additional keyword arguments are passed to
+        :meth:`pylidc.Scan.to_volume`.
+
+        Return
+        ------
+        roi: ndarray
+            Equal to `ann.scan.to_volume()[ann.bbox(pad=pad)]`.
+
+        Example
+        -------
+        An example::
+
+            import pylidc as pl
+            
+            ann = pl.query(pl.Annotation).first()
+            
+            roi  = ann.roi_volume(pad=10)
+            mask = ann.boolean_mask(pad=10)
+            
+            print(roi.shape == mask.shape)
+            # => True
+        """
+        bb = self.bbox(pad=pad)
+        return self.scan.to_volume(verbose=verbose, k_range=bb[2],
+                                   ij_window=bb[:2], **kwargs)
+
+
+    @memoized_property
     def centroid(self):
         """
         The center of mass of the nodule as determined by its 
@@ -592,7 +633,7 @@ class Annotation(Base):
         """
         return self.contours_matrix.mean(axis=0)
 
-    @property
+    @memoized_property
     def diameter(self):
         """
         Estimate the greatest axial plane diameter using the annotation's 
@@ -606,49 +647,101 @@ class Annotation(Base):
             The maximal diameter as float, accounting for the axial-plane 
             resolution of the scan. The units are mm.
         """
-        greatest_diameter = -np.inf
-        i,j,k = 0,0,1 # placeholders for max indices
-        for c,contour in enumerate(self.contours):
-            contour_array = contour.to_matrix()[:,:2]*self.scan.pixel_spacing
-
-            # There's some edge cases where the contour consists only of 
-            # a single point, which we must ignore.
-            if contour_array.shape[0]==1: continue
-            
-            # pdist computes the pairwise distances between the points.
-            # squareform turns the condensed array into matrix where
-            # entry i,j is ||point_i - point_j||.
-            diameters = squareform(pdist(contour_array))
-            diameter  = diameters.max()
+        ij, counts, _, _ = self._contour_coords()
 
-            if diameter > greatest_diameter:
-                greatest_diameter = diameter
-                i = c
-                j,k = np.unravel_index(diameters.argmax(), diameters.shape)
+        # Contours consisting only of a single point are ignored.
+        chords = max_chords(ij, counts, self.scan.pixel_spacing)
+        return chords.max() if len(chords) > 0 else -np.inf
 
-        return greatest_diameter
-
-    @property
+    def _contour_coords(self):
+        """
+        Return the (i,j) coordinates of all the contours, concatenated,
+        the number of points, the `image_z_position` and the `inclusion`
+        flag of each contour.
+        """
+        store = get_contour_store()
+        packed = None if store is None else store.annotation_coords(self.id)
+        if packed is not None:
+            ij, zs, counts = packed
+            return ij, counts, zs, store.annotation_inclusion(self.id)
+
+        contours = self.contours
+        matrices = [c._ij() for c in contours]
+        zs = np.array([c.image_z_position for c in contours], dtype=float)
+        inclusion = np.array([c.inclusion for c in contours], dtype=bool)
+        if len(matrices) == 0:
+            return np.zeros((0,2), dtype=int), np.zeros(0, dtype=int), \
+                   zs, inclusion
+        return np.vstack(matrices), np.array([len(m) for m in matrices]), \
+               zs, inclusion
+
+    @memoized_property
     def surface_area(self):
         """
         Estimate the surface area by summing the areas of a trianglation
         of the nodules surface in 3d. Returned units are mm^2.
 
+        The triangulation is the marching cubes mesh of the boolean mask
+        (see `boolean_mask`). Its area is summed from the areas of the
+        triangles of each 2x2x2 mask configuration, without building the
+        mesh itself. See also `lofted_surface_area`.
+
         Return
         ------
         sa: float
             The estimated surface area in squared millimeters.
         """
-        mask = self.boolean_mask()
-        mask = np.pad(mask, [(1,1), (1,1), (1,1)], 'constant') # Cap the ends.
-        mask = mask.astype(float)
-
         rij  = self.scan.pixel_spacing
         rk   = self.scan.slice_thickness
-        verts, faces, _, _ = marching_cubes(mask, 0.5, spacing=(rij, rij, rk))
-        return mesh_surface_area(verts, faces)
+        return mask_surface_area(self.boolean_mask(), (rij, rij, rk))
 
-    @property
+    @memoized_property
+    def lofted_surface_area(self):
+        """
+        A coarse estimate of the surface area from the contours alone,
+        skipping the 3D mask that `surface_area` builds. Returned units
+        are mm^2.
+
+        The contours of consecutive slices are joined by frustums whose
+        lateral area is computed from the perimeters and (equal-area
+        radius of the) areas of the contours. The end contours are
+        extended by half the slice spacing and capped, like the slabs of
+        `volume`. The in-plane shape changes between slices are ignored,
+        and the estimate typically differs from `surface_area` by 20 to
+        40% (median relative difference 0.18, 90th percentile 0.38, see
+        `benchmarks/surface_area.py`).
+
+        Return
+        ------
+        sa: float
+            The estimated surface area in squared millimeters.
+        """
+        ij, counts, zs, inclusion = self._contour_coords()
+        if len(counts) == 0:
+            return 0.0
+
+        perimeters, areas = polygon_measures(ij, counts,
+                                              self.scan.pixel_spacing)
+        zvals, k = np.unique(zs, return_inverse=True)
+        perimeter = np.bincount(k, weights=perimeters)
+        area = np.bincount(k, weights=np.where(inclusion, areas, -areas))
+        area = np.maximum(area, 0)
+
+        if len(zvals) > 1:
+            dz = np.diff(zvals)
+            ends = dz[0], dz[-1]
+        else:
+            dz = np.zeros(0)
+            ends = self.scan.slice_thickness, self.scan.slice_thickness
+
+        radius = np.sqrt(area / np.pi)
+        slant  = np.sqrt(dz**2 + np.diff(radius)**2)
+        lateral = 0.5*(perimeter[:-1] + perimeter[1:]) * slant
+
+        return lateral.sum() + area[0] + area[-1] + \
+               0.5*(perimeter[0]*ends[0] + perimeter[-1]*ends[1])
+
+    @memoized_property
     def volume(self):
         """
         Estimate the volume of the annotated nodule, using the contour 
@@ -665,8 +758,8 @@ class Annotation(Base):
         slice below. If the the `image_z_position` corresponds to an end 
         piece, we use the distance between the current `image_z_posiition` 
         and the `image_z_position` of one slice below or above for top or 
-        bottom, respectively. If the annotation only has one contour, we 
-        use the `slice_thickness` attribute of the scan.
+        bottom, respectively. If the annotation only has contours in one
+        slice, we use the `slice_thickness` attribute of the scan.
 
         Return
         ------
@@ -674,34 +767,12 @@ class Annotation(Base):
             The estimated 3D volume of the annotated nodule. Units are cubic
             millimeters.
         """
-        volume = 0.
-        zvals  = np.unique([c.image_z_position for c in self.contours])
-
-        # We pad a zval on the bottom that is the same distance from the
-        # first zval to the second zval but below the first point. We do 
-        # the same thing for the top zval.
-        if len(self.contours) != 1:
-            zlow  = zvals[ 0] - (zvals[1]-zvals[0])
-            zhigh = zvals[-1] + (zvals[-1]-zvals[-2])
-            zvals = np.r_[zlow, zvals, zhigh]
-        else:
-            zvals = None
-
-        for i,contour in enumerate(self.contours):
-            contour_array = contour.to_matrix() * self.scan.pixel_spacing
-            x = contour_array[:,0]
-            y = contour_array[:,1]
-            # "Shoelace" formula for area.
-            area = 0.5*np.abs(np.dot(x,np.roll(y,1))-np.dot(y,np.roll(x,1)))
-            
-            if zvals is not None:
-                j = np.argmin(np.abs(contour.image_z_position-zvals))
-                spacing_z = 0.5*(zvals[j+1]-zvals[j-1])
-            else:
-                spacing_z = self.scan.slice_thickness
+        ij, counts, zs, inclusion = self._contour_coords()
 
-            volume += (1. if contour.inclusion else -1.) * area * spacing_z
-        return volume
+        areas = shoelace_areas(ij, counts, self.scan.pixel_spacing)
+        slabs = slab_thicknesses(zs, [len(counts)],
+                                  [self.scan.slice_thickness])
+        return np.sum(np.where(inclusion, 1., -1.) * areas * slabs)
 
     def visualize_in_3d(self, edgecolor='0.2', cmap='viridis',
                         step=1, figsize=(5,5), backend='matplotlib'):
@@ -738,6 +809,10 @@ class Annotation(Base):
             ann = pl.query(pl.Annotation).first()
             ann.visualize_in_3d(edgecolor='green', cmap='autumn')
         """
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+        marching_cubes = get_marching_cubes()
+
         if backend not in viz3dbackends:
             raise ValueError("backend should be in %s." % viz3dbackends)
 
@@ -808,6 +883,9 @@ class Annotation(Base):
         verbose: bool, default=True
             Turn the image loading statement on/off.
         """
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider, CheckButtons
+
         images = self.scan.load_all_dicom_images(verbose)
         
         # Preload contours and sort them by z pos.
@@ -938,12 +1016,12 @@ class Annotation(Base):
 
         plt.show()
 
-    @property
+    @memoized_property
     def contour_slice_zvals(self):
         """An array of unique z-coordinates for the contours."""
         return np.sort([c.image_z_position for c in self.contours])        
 
-    @property
+    @memoized_property
     def contour_slice_indices(self):
         """
         Returns an array of indices into the scan where each contour
@@ -961,13 +1039,22 @@ class Annotation(Base):
                 # the two z values should the same (up to machine precision)
                 print(k, z, scan_zvals[k]) 
         """
-        return np.sort([c.image_k_position for c in self.contours])
+        ks = self.scan.contour_k_indices()
+        return np.sort([ks[c.id] for c in self.contours])
 
-    @property
+    @memoized_property
     def contours_matrix(self):
         """
         All the contour index values a 3D numpy array.
         """
+        store = get_contour_store()
+        packed = None if store is None else store.annotation_coords(self.id)
+
+        if packed is not None:
+            ij, czs, counts = packed
+            ks = self.scan.slice_indices(czs)
+            return np.c_[ij, np.repeat(ks, counts)].astype(int)
+
         return np.vstack([c.to_matrix(include_k=True)
                                 for c in sorted(self.contours,
                                         key=lambda c: c.image_z_position)])
@@ -1016,37 +1103,32 @@ class Annotation(Base):
         czs = self.contour_slice_zvals
         cks = self.contour_slice_indices
 
-        zs = self.scan.slice_zvals
-        zs = zs[cks[0]:cks[-1]+1]
-
-        # Lambda to map a z-value to its appropriate index in the volume.
-        z_to_index = lambda z: dict(zip(czs,cks))[z] - bb[2,0]#cks[0]
+        # Map a contour z-value to its index in the mask.
+        k_of_z = dict(zip(czs, cks))
+        z_to_index = lambda z: k_of_z[z] - bb[2,0]
 
         # Get dimensions, initialize mask.
         ni,nj,nk = np.diff(bb, axis=1).astype(int)[:,0] + 1
         mask = np.zeros((ni,nj,nk), dtype=bool)
 
-        # We check if these points are enclosed within each contour 
-        # for a given slice. `test_points` is a list of image coordinate 
-        # points, offset by the bounding box.
-        ii,jj = np.indices(mask.shape[:2])
-        test_points = bb[:2,0] + np.c_[ii.flatten(), jj.flatten()]
+        contours = self.contours
+        matrices = []
+        for contour in contours:
+            C = contour._ij()
+            # Turn the contour closed if it is not.
+            if (C[0] != C[-1]).any():
+                C = np.append(C, C[0].reshape(1,2), axis=0)
+            matrices.append(C)
+
+        # Fill all the contours at once. The last (closing) vertex is
+        # dropped, like matplotlib does for a closed path.
+        inside = fill_polygons([C[:-1] for C in matrices],
+                                bb[:2,0], mask.shape[:2])
 
         # First we "turn on" pixels enclosed by inclusion contours.
-        for contour in self.contours:
+        for contour, C, contains_pts in zip(contours, matrices, inside):
             if contour.inclusion:
                 zi = z_to_index(contour.image_z_position)
-                C  = contour.to_matrix(include_k=False)
-
-                # Turn the contour closed if it is not.
-                if (C[0] != C[-1]).any():
-                    C = np.append(C, C[0].reshape(1,2), axis=0)
-
-                # Create path object and test all pixels
-                # within the contour's bounding box.
-                path = mplpath.Path(C, closed=True)
-                contains_pts = path.contains_points(test_points)
-                contains_pts = contains_pts.reshape(mask.shape[:2])
 
                 # The logical or here prevents the cases where a single
                 # slice contains multiple inclusion regions.
@@ -1059,19 +1141,10 @@ class Annotation(Base):
                     mask[i,j,k] = False
 
         # Second, we "turn off" pixels enclosed by exclusion contours.
-        for contour in self.contours:
+        for contour, C, contains_pts in zip(contours, matrices, inside):
             if not contour.inclusion:
                 zi = z_to_index(contour.image_z_position)
-                C = contour.to_matrix(include_k=False)
-
-                # Turn the contour closed if it is not.
-                if (C[0] != C[-1]).any():
-                    C = np.append(C, C[0].reshape(1,2), axis=0)
-
-                path = mplpath.Path(C, closed=True)
-                not_contains_pts = ~path.contains_points(test_points)
-                not_contains_pts = not_contains_pts.reshape(mask.shape[:2])
-                mask[:,:,zi] = np.logical_and(mask[:,:,zi], not_contains_pts)
+                mask[:,:,zi] = np.logical_and(mask[:,:,zi], ~contains_pts)
 
                 # Remove the contour points themselves.
                 i, j = (C - bb[:2,0]).T
@@ -1080,6 +1153,57 @@ class Annotation(Base):
 
         return mask
 
+    def _overlap_mask(self):
+        """
+        Private method used to compute the overlap between nodules of
+        the same scan (see `pylidc.annotation_distance_metrics`). It is
+        the set of `_as_set` as a boolean volume.
+
+        Return
+        ------
+        mask: ndarray of bools, shape=(ni,nj,nz)
+            `mask[i,j,k]` is True if voxel `(i0+i, j0+j, zvals[k])` is
+            in the set.
+
+        origin: ndarray, shape=(2,)
+            The `(i0, j0)` image coordinates of `mask[0,0]`.
+
+        zvals: ndarray, shape=(nz,)
+            The sorted, unique contour z-values.
+        """
+        contours = self.contours
+        matrices = []
+        for contour in contours:
+            C = contour._ij()
+            # Turn the contour closed if it's not.
+            if (C[0] != C[-1]).all():
+                C = np.append(C, C[0].reshape(1,2), axis=0)
+            matrices.append(C)
+
+        ij = np.vstack(matrices)
+        origin = ij.min(axis=0).astype(int)
+        shape  = ij.max(axis=0).astype(int) - origin + 1
+
+        zs = np.array([c.image_z_position for c in contours], dtype=float)
+        zvals, ks = np.unique(zs, return_inverse=True)
+
+        # Points outside of a contour's bounding box are never inside
+        # it, so the contours are all filled in the common bounding box.
+        # The last vertex is dropped, like matplotlib does for a closed
+        # path.
+        inside = fill_polygons([C[:-1] for C in matrices], origin, shape)
+
+        included = np.zeros(tuple(shape) + (len(zvals),), dtype=bool)
+        excluded = np.zeros_like(included)
+        for contour, k, contains_pts in zip(contours, ks, inside):
+            if contour.inclusion:
+                included[:,:,k] |= contains_pts
+            else:
+                excluded[:,:,k] |= contains_pts
+
+        mask = included & ~excluded
+        return mask, origin, zvals
+
     def _as_set(self):
         """
         Private function used to computed overlap between nodules of the 
@@ -1087,61 +1211,28 @@ class Annotation(Base):
         3-tuple referring to a voxel within the scan. If the voxel is 
         in the set, the nodule is considered to be defined there.
         
-        Essentially this is a boolean mask stored as a set.
+        Essentially this is a boolean mask stored as a set, see
+        `_overlap_mask` for the boolean mask itself.
         """
-        included = set()
-        excluded = set()
-        # Add all points lying within each inclusion contour to S.
-        for contour in self.contours:
-            contour_matrix = contour.to_matrix()[:,:2]
-            # Turn the contour closed if it's not.
-            if (contour_matrix[0] != contour_matrix[-1]).all():
-                contour_matrix = np.append(contour_matrix,
-                                           contour_matrix[0].reshape(1,2),
-                                           axis=0)
-
-            # Create path object and test all pixels 
-            # within the contour's bounding box.
-            path = mplpath.Path(contour_matrix, closed=True)
-            mn = contour_matrix.min(axis=0)
-            mx = contour_matrix.max(axis=0)
-            x,y = np.mgrid[mn[0]:mx[0]+1, mn[1]:mx[1]+1]
-            test_points = np.c_[x.flatten(), y.flatten()]
-            points_in_contour = test_points[path.contains_points(test_points)]
-
-            # Add the z coordinate.
-            points_in_contour = np.c_[\
-                points_in_contour,\
-                np.ones(points_in_contour.shape[0])*contour.image_z_position
-            ]
-
-            # Now turn the numpy matrix into a list of tuples,
-            # so we can add it to the corresponding set.
-            points_in_contour = list(map(tuple, points_in_contour))
-
-            # Update the corresponding set.
-            if contour.inclusion:
-                included.update(points_in_contour)
-            else:
-                excluded.update(points_in_contour)
-        # Return the included points minus the excluded points.
-        return included.difference( excluded )
+        mask, origin, zvals = self._overlap_mask()
+        i, j, k = np.nonzero(mask)
+        points = np.c_[i + origin[0], j + origin[1]].astype(float)
+        return set(zip(points[:,0].tolist(), points[:,1].tolist(),
+                       zvals[k].tolist()))
 
     def uniform_cubic_resample(self, side_length=None, resample_vol=True,
                                irp_pts=None, return_irp_pts=False,
-                               resample_img=True, verbose=True):
+                               resample_img=True, verbose=True, spacing=1):
         """
         Get the CT value volume and respective boolean mask volume. The 
         volumes are interpolated and resampled to have uniform spacing of 1mm
-        along each dimension. The resulting volumes are cubic of the 
-        specified `side_length`. Thus, the returned volumes have dimensions,
-        `(side_length+1,)*3` (since `side_length` is the spacing).
+        (or `spacing`) along each dimension. The resulting volumes are cubic
+        of the specified `side_length`. Thus, the returned volumes have
+        dimensions, `(side_length+1,)*3` (with the default spacing).
 
-        TODO
-        ----
-        It would be nice if this function performed fully general 
-        interpolation, i.e., not necessarily uniform spacing and allowing 
-        different resample-resolutions along different coordinate axes.
+        Only the slices and in-plane window around the nodule are read,
+        and the volumes are interpolated one axis at a time, in single
+        precision.
 
         Parameters
         ----------
@@ -1154,7 +1245,9 @@ class Annotation(Base):
             greater than any bounding box dimension. If the specified 
             `side_length` requires a padding which results in an 
             out-of-bounds image index, then the image is padded with 
-            the minimum CT image value.
+            the minimum CT value of the scan if the scan is in the
+            volume store (see `pylidc.volume_store`), and with the
+            value of air (-1024 HU) otherwise.
 
         resample_vol: boolean, default=True
             If False, only the segmentation volume is resampled.
@@ -1174,11 +1267,17 @@ class Annotation(Base):
         verbose: boolean, default=True
             Turn the loading statement on / off.
 
+        spacing: float or 3-tuple of floats, default=1
+            The spacing of the resampled volumes in millimeters, either
+            the same along each dimension, or one per dimension. The
+            `side_length` must be a multiple of each spacing. A volume
+            has `side_length/spacing+1` points along each dimension.
+
         Return
         ------
         [ct_volume,] mask [, irp_pts]: ndarray, ndarray, list of ndarrays
-            `ct_volume` and `mask` are the resampled CT and boolean 
-            volumes, respectively. `ct_volume` and `irp_points` are optionally
+            `ct_volume` and `mask` are the resampled CT (float32) and
+            boolean volumes, respectively. `ct_volume` and `irp_points` are optionally
             returned, depending on which flags are set (see above).
 
         Example
@@ -1236,20 +1335,20 @@ class Annotation(Base):
                 raise ValueError('`side_length` must be greater\
                                    than any bounding box dimension.')
         side_length = float(side_length)
-        # } End input checks.
 
-        # Load the images. Get the z positions.
-        images = self.scan.load_all_dicom_images(verbose=verbose)
-        img_zs = [float(img.ImagePositionPatient[-1]) for img in images]
-        img_zs = np.unique(img_zs)
-
-        # Get the z values of the contours.
-        contour_zs = np.unique([c.image_z_position for c in self.contours])
+        spacing = np.broadcast_to(np.asarray(spacing, dtype=float), (3,))
+        if (spacing <= 0).any():
+            raise ValueError('`spacing` must be positive.')
+        nsteps = side_length / spacing
+        if (np.abs(nsteps - np.round(nsteps)) > 1e-5).any():
+            raise ValueError('`side_length` must be a multiple of `spacing`.')
+        nsteps = np.round(nsteps).astype(int)
+        # } End input checks.
 
-        # Get the indices where the nodule stops and starts
-        # with respect to the scan z values.
-        #kmin = np.where(zmin == img_zs)[0][0]
-        #kmax = np.where(zmax == img_zs)[0][0]
+        # The slices of the scan (only the ones around the nodule are
+        # read below) and their z positions.
+        images, img_zs, rows, cols = self.scan._pixel_sources(verbose=verbose)
+        img_zs = np.asarray(img_zs, dtype=float)
 
         # Initialize the boolean mask.
         mask = self.boolean_mask()
@@ -1258,23 +1357,14 @@ class Annotation(Base):
         # { Begin interpolation grid creation.
         #   (The points at which the volumes will be resampled.)
 
-        # Compute new interpolation grid points in x.
-        d = 0.5*(side_length-(xmax - xmin))
-        xhat, step = np.linspace(xmin-d, xmax+d,
-                                 int(side_length)+1, retstep=True)
-        assert abs(step-1) < 1e-5, "New x spacing != 1."
-
-        # Do the same for y.
-        d = 0.5*(side_length-(ymax - ymin))
-        yhat, step = np.linspace(ymin-d, ymax+d,
-                                 int(side_length)+1, retstep=True)
-        assert abs(step-1) < 1e-5, "New y spacing != 1."
-
-        # Do the same for z.
-        d = 0.5*(side_length-(zmax - zmin))
-        zhat, step = np.linspace(zmin-d, zmax+d,
-                                 int(side_length)+1, retstep=True)
-        assert abs(step-1) < 1e-5, "New z pixel spacing != 1."
+        hats = []
+        for lo, hi, n, s, axis in zip((xmin, ymin, zmin), (xmax, ymax, zmax),
+                                      nsteps, spacing, 'xyz'):
+            d = 0.5*(side_length-(hi - lo))
+            hat, step = np.linspace(lo-d, hi+d, n+1, retstep=True)
+            assert abs(step-s) < 1e-5, "New %s spacing != %g." % (axis, s)
+            hats.append(hat)
+        xhat, yhat, zhat = hats
 
         # } End interpolation grid creation.
         ########################################################
@@ -1299,49 +1389,36 @@ class Annotation(Base):
         # then `ax` is the minimum possible index, 0. A similar
         # diagram helps with the `bx` index.
 
-        T = np.arange(0, 512)*rij
-
-        if xhat[0] <= 0:
-            ax = 0
-        else:
-            ax = (T < xhat[0]).sum() - 1
-        if xhat[-1] >= T[-1]:
-            bx = 512
-        else:
-            bx = 512 - (T > xhat[-1]).sum() + 1
+        def _grid_range(T, hat):
+            if hat[0] <= T[0]:
+                a = 0
+            else:
+                a = (T < hat[0]).sum() - 1
+            if hat[-1] >= T[-1]:
+                b = len(T)
+            else:
+                b = len(T) - (T > hat[-1]).sum() + 1
+            return a, b
 
-        if yhat[0] <= 0:
-            ay = 0
-        else:
-            ay = (T < yhat[0]).sum() - 1
-        if yhat[-1] >= T[-1]:
-            by = 512
-        else:
-            by = 512 - (T > yhat[-1]).sum() + 1
+        ax,bx = _grid_range(np.arange(0, rows)*rij, xhat)
+        ay,by = _grid_range(np.arange(0, cols)*rij, yhat)
+        az,bz = _grid_range(img_zs, zhat)
 
-        if zhat[0] <= img_zs[0]:
-            az = 0
-        else:
-            az = (img_zs < zhat[0]).sum() - 1
-        if zhat[-1] >= img_zs[-1]:
-            bz = len(img_zs)
-        else:
-            bz = len(img_zs) - (img_zs > zhat[-1]).sum() + 1
-        
         # These are the actual grids.
-        x = T[ax:bx]
-        y = T[ay:by]
+        x = np.arange(ax, bx)*rij
+        y = np.arange(ay, by)*rij
         z = img_zs[az:bz]
 
         # } End grid creation.
         ########################################################
 
-
-        # Create the non-interpolated CT volume.
+        # Create the non-interpolated CT volume, reading only the
+        # slices and the in-plane window of the grid.
         if resample_vol:
-            ctvol = np.zeros(x.shape+y.shape+z.shape, dtype=np.float64)
+            ctvol = np.empty(x.shape+y.shape+z.shape, dtype=np.float32)
+            window = (slice(ax, bx), slice(ay, by))
             for k in range(z.shape[0]):
-                ctvol[:,:,k] = images[k+az].pixel_array[ax:bx, ay:by]
+                ctvol[:,:,k] = slice_pixels(images[k+az], window)
 
         # We currently only have the boolean mask volume on the domain
         # of the bounding box. Thus, we must "place it" in the appropriately
@@ -1353,26 +1430,58 @@ class Annotation(Base):
         mask = np.pad(mask, pad_width=padvals,
                       mode='constant', constant_values=False)
 
-        # Obtain minimum image value to use as const for interpolation.
-        if resample_vol:
-            fillval = min([img.pixel_array.min() for img in images])
-
         if irp_pts is None:
-            ix,iy,iz = np.meshgrid(xhat, yhat, zhat, indexing='ij')
+            axes = (xhat, yhat, zhat)
         else:
-            ix,iy,iz = irp_pts
-        IXYZ = np.c_[ix.flatten(), iy.flatten(), iz.flatten()]
-
-        # Interpolate the nodule CT volume.
+            axes = grid_axes(*irp_pts)
+
+        # Interpolate the volumes with the weights of the linear
+        # `RegularGridInterpolator` on the grid `(x, y, z)`. Points on
+        # a grid are interpolated one axis at a time, without forming
+        # the points, and any other points with `map_coordinates`.
+        if axes is not None:
+            weights = [linear_weights(g, a) for g, a in zip((x, y, z), axes)]
+            shape = tuple(len(a) for a in axes)
+            outside = weights[0][2][:,None,None] | \
+                      weights[1][2][None,:,None] | \
+                      weights[2][2][None,None,:]
+
+            def _resample(vol):
+                for axis, (i, w, _) in enumerate(weights):
+                    vol = interp_axis(vol, i, w, axis)
+                return vol
+        else:
+            from scipy.ndimage import map_coordinates
+
+            shape = np.shape(irp_pts[0])
+            weights = [linear_weights(g, np.ravel(a))
+                       for g, a in zip((x, y, z), irp_pts)]
+            coords = np.array([i + w for i, w, _ in weights])
+            outside = (weights[0][2] | weights[1][2] |
+                       weights[2][2]).reshape(shape)
+
+            def _resample(vol):
+                out = map_coordinates(vol.astype(np.float32), coords,
+                                      order=1, mode='nearest')
+                out = out.reshape(shape)
+                return out > 0 if vol.dtype == bool else out
+
+        # Interpolate the nodule CT volume. Points outside of the grid
+        # take the minimum value of the scan, found without reading any
+        # other slice.
         if resample_vol:
-            rgi = RegularGridInterpolator(points=(x, y, z), values=ctvol,
-                                          bounds_error=False, fill_value=fillval)
-            ictvol = rgi(IXYZ).reshape(ix.shape)
+            ictvol = _resample(ctvol)
+            if outside.any():
+                ictvol[outside] = self.scan._pixel_minimum(images)
 
         # Interpolate the mask volume.
-        rgi = RegularGridInterpolator(points=(x, y, z), values=mask,
-                                      bounds_error=False, fill_value=False)
-        imask = rgi(IXYZ).reshape(ix.shape) > 0
+        imask = _resample(mask)
+        imask[outside] = False
+
+        if return_irp_pts:
+            if irp_pts is None:
+                irp_pts = np.meshgrid(xhat, yhat, zhat, indexing='ij')
+            ix,iy,iz = irp_pts
 
         if resample_vol:
             if return_irp_pts:
@@ -1394,6 +1503,8 @@ class Annotation(Base):
         Simple method that helps visualizing the nodule's 
         boundary according to the respective annotations 
         """
+        import matplotlib.pyplot as plt
+
         vol = self.scan.to_volume()
         con = self.contours[3]
 
@@ -1410,16 +1521,16 @@ class Annotation(Base):
         Method that allows to visualize both nodule's outline 
         from the CT Scan as well as its respective mask
         """
-        vol = self.scan.to_volume()
+        import matplotlib.pyplot as plt
 
         padding = [(30,10), (10,25), (0,0)]
 
         mask = self.boolean_mask(pad=padding)
-        bbox = self.bbox(pad=padding)
+        roi  = self.roi_volume(pad=padding)
 
         fig,ax = plt.subplots(1,2,figsize=(5,3))
 
-        ax[0].imshow(vol[bbox][:,:,2], cmap=plt.cm.gray)
+        ax[0].imshow(roi[:,:,2], cmap=plt.cm.gray)
         ax[0].axis('off')
 
         # Add a red contour of the mask on the left image
@@ -4,6 +4,7 @@ import numpy as np
 from ._Base import Base
 from .Scan import Scan
 from .Annotation import Annotation
+from .contour_store import get_contour_store
 
 _off_limits = ['id','annotation_id','annotation',
                'inclusion','image_z_position','dicom_file_name','coords']
@@ -84,10 +85,15 @@ class Contour(Base):
         ----
         This index may not be unique if the `slice_zvals` of the respective
         scan are not unique.
+
+        The indices of all the contours of the scan are resolved at once 
+        (see :meth:`pylidc.Scan.contour_k_indices`).
         """
-        zs = self.annotation.scan.slice_zvals
-        k = np.abs(zs-self.image_z_position).argmin()
-        return k
+        scan = self.annotation.scan
+        try:
+            return scan.contour_k_indices()[self.id]
+        except KeyError:
+            return scan.slice_indices(self.image_z_position)[()]
 
     def to_matrix(self, include_k=True):
         """
@@ -98,17 +104,36 @@ class Contour(Base):
         ----------
         include_k: bool, default=True
             Set `include_k=False` to omit the `k` axis coordinate. 
+
+        Note
+        ----
+        If a packed contour store has been built (see 
+        :func:`pylidc.contour_store.build_contour_store`), the coordinates
+        are read from it instead of being parsed from `coords`. The
+        returned array is always a new, writable int array.
         """
-        # The reversal [::-1] is because the coordinates from the LIDC XML
-        # are stored as (x,y), not (i,j).
-        ij = np.array([[int(cc) for cc in c.split(',')][::-1]
-                        for c in self.coords.split('\n')])
+        ij = np.array(self._ij(), dtype=int)
         if not include_k:
             return ij
         else:
             k  = np.ones(ij.shape[0])*self.image_k_position
-            zs = self.annotation.contour_slice_zvals
             return np.c_[ij, k].astype(int)
+
+    def _ij(self):
+        """
+        The (i,j) coordinates of the contour, as a read-only int16 view
+        into the packed contour store when it has been built, for the
+        geometry computations that do not modify them.
+        """
+        store = get_contour_store()
+        ij = None if store is None else store.contour_coords(self.id)
+
+        if ij is None:
+            # The reversal [::-1] is because the coordinates from the LIDC
+            # XML are stored as (x,y), not (i,j).
+            ij = np.array([[int(cc) for cc in c.split(',')][::-1]
+                            for c in self.coords.split('\n')])
+        return ij
     
 Annotation.contours = relationship('Contour',
                                    order_by=Contour.id,
@@ -1,18 +1,22 @@
 import os
 import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 import pydicom as dicom
 import numpy as np
 
 import sqlalchemy as sq
 from ._Base import Base
+from ._memo import memoized_property, memoized_method, clear as _clear_memo
+from .contour_store import get_contour_store
+from .dicom_catalog import get_dicom_catalog
+from .dicom_pixels import slice_pixels
+from .volume_cache import get_volume_cache
+from .volume_store import get_volume_store
+from .image_cache import get_image_cache, freeze
 
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider
-
-from scipy.sparse.csgraph import connected_components
-from .annotation_distance_metrics import metrics
+from .annotation_distance_metrics import metrics, pairwise_metrics
 
 
 try:
@@ -50,12 +54,37 @@ def _get_config_file():
                         _get_config_filename())
 
 
+def _get_cache_path():
+    """
+    Yields the directory where derived data (e.g., packed contour 
+    coordinates) is stored. It can be set via the `PYLIDC_CACHE` 
+    environment variable and defaults to `~/.pylidc_cache`.
+    """
+    return os.environ.get('PYLIDC_CACHE',
+                          os.path.join(_get_config_path(), '.pylidc_cache'))
+
+
+# (config file, modification time) -> dicom path, see below.
+_dicom_path_cache = {}
+
+
 def _get_dicom_file_path_from_config_file():
     """
-    Loads the dicom section of the configuration file
+    Loads the dicom section of the configuration file. The value is
+    cached until the file is modified.
     """
     conf_file = _get_config_file()
+    mtime = os.path.getmtime(conf_file) if os.path.exists(conf_file) else None
 
+    key = (conf_file, mtime)
+    if key not in _dicom_path_cache:
+        path = _read_dicom_file_path_from_config_file(conf_file)
+        _dicom_path_cache.clear()
+        _dicom_path_cache[key] = path
+    return _dicom_path_cache[key]
+
+
+def _read_dicom_file_path_from_config_file(conf_file):
     parser = SafeConfigParser()
 
     if os.path.exists(conf_file):
@@ -79,6 +108,80 @@ def _get_dicom_file_path_from_config_file():
         return parser.get(section='dicom', option='path')
 
 
+# DICOM elements larger than this (i.e., the pixel data) are not read
+# with the header; they are read from the file when first accessed,
+# e.g., by `image.pixel_array`.
+_defer_size = '1 KB'
+
+# The CT value of air (in HU), used to pad resampled volumes when the
+# minimum of the scan is not known (see `Scan._pixel_minimum`).
+_air_value = -1024
+
+# `Scan.to_volume` decodes the slices in blocks of this many slices.
+# Copying a block at once into the (rows, cols, slices) volume is much
+# faster than writing its slices one by one with a stride.
+_volume_block_size = 32
+
+
+def _rescale(image):
+    """
+    The `(RescaleSlope, RescaleIntercept)` of a DICOM slice (dataset or
+    DICOM catalog record).
+    """
+    if hasattr(image, 'rescale_slope'):
+        return image.rescale_slope, image.rescale_intercept
+    return image.RescaleSlope, image.RescaleIntercept
+
+
+def _decode_slice_block(images, dtype, window=None):
+    """
+    Decode and rescale a block of DICOM slices (datasets, DICOM catalog
+    records, or file paths when run in a worker process) into a
+    (slices, rows, cols) array, optionally cropped to `window`, a pair of
+    in-plane `slice` objects. Each dataset is released from `images` once
+    it is decoded.
+    """
+    block = None
+    for i in range(len(images)):
+        x = images[i]
+        images[i] = None
+        if isinstance(x, str):
+            x = dicom.dcmread(x, defer_size=_defer_size)
+        pixels = slice_pixels(x, window)
+        slope, intercept = _rescale(x)
+        if block is None:
+            block = np.empty((len(images),) + pixels.shape, dtype=dtype)
+        block[i] = pixels * slope + intercept
+    return block
+
+
+def _as_slice(value):
+    """
+    Turn None, a `slice` or a `(start, stop)` pair into a `slice`.
+    """
+    if value is None:
+        return slice(None)
+    if isinstance(value, slice):
+        return value
+    start, stop = value
+    return slice(start, stop)
+
+
+def _unique_slice_order(zs, inums):
+    """
+    Return the indices of the slices to keep, sorted by z, among slices
+    at the z positions `zs` with the InstanceNumbers `inums`. Of the
+    slices sharing a z position, the one with the lesser InstanceNumber
+    is kept (and the first listed among those with equal InstanceNumber).
+
+    Sorting by (z, InstanceNumber, list order) puts the slice to keep
+    first in each run of equal z.
+    """
+    order = sorted(range(len(zs)), key=lambda i: (zs[i], inums[i], i))
+    return [i for n,i in enumerate(order)
+            if n == 0 or zs[i] != zs[order[n-1]]]
+
+
 _off_limits = ['id','study_instance_uid','series_instance_uid',
                'patient_id','slice_thickness','pixel_spacing',
                'contrast_used','is_from_initial','sorted_dicom_file_names']
@@ -181,6 +284,22 @@ class Scan(Base):
         else:
             super(Scan, self).__setattr__(name,value)
 
+    def clear_cache(self, annotations=True):
+        """
+        Drop the memoized derived quantities of the scan (`slice_zvals`,
+        `slice_spacing`, and `spacings`).
+
+        Parameters
+        ----------
+        annotations: bool, default=True
+            Also clear the memoized quantities of the (already loaded) 
+            annotations of the scan.
+        """
+        _clear_memo(self)
+        if annotations and 'annotations' in self.__dict__:
+            for ann in self.annotations:
+                ann.clear_cache()
+
     def get_path_to_dicom_files(self):
         """
         Get the path to where the DICOM files are stored for this scan, 
@@ -209,6 +328,10 @@ class Scan(Base):
         `study_instance_uid` and `series_instance_uid`.
 
         Option 2 is less efficient than 1; however, option 2 is robust.
+
+        If a DICOM catalog has been built (see
+        `pylidc.dicom_catalog.build_dicom_catalog`), the path is looked up
+        in it instead, without reading any DICOM file.
         """
         dicompath = _get_dicom_file_path_from_config_file()
 
@@ -218,6 +341,13 @@ class Scan(Base):
                    "file {}?")
             raise RuntimeError(msg.format(_get_config_file()))
 
+        catalog = get_dicom_catalog()
+        if catalog is not None:
+            path = catalog.series_directory(self.study_instance_uid,
+                                            self.series_instance_uid)
+            if path is not None and os.path.isdir(path):
+                return path
+
         base = os.path.join(dicompath, self.patient_id)
 
         if not os.path.exists(base):
@@ -261,6 +391,78 @@ class Scan(Base):
 
         return path
 
+    def _dicom_catalog_records(self):
+        """
+        Return the de-duplicated, z-sorted slice records of the scan from
+        the DICOM catalog, or None if there is no catalog, the scan is
+        not in it, or some of its files are missing.
+        """
+        catalog = get_dicom_catalog()
+        if catalog is None:
+            return None
+
+        records = catalog.series_records(self.study_instance_uid,
+                                         self.series_instance_uid)
+        if len(records) == 0:
+            return None
+
+        if not all(os.path.exists(r.path) for r in records):
+            msg = ("The DICOM catalog {} lists missing files for {}; "
+                   "falling back to reading the DICOM directory. Run "
+                   "`build_dicom_catalog` to rebuild the catalog.")
+            warnings.warn(msg.format(catalog.path, self))
+            return None
+
+        return records
+
+    def _pixel_sources(self, verbose=True):
+        """
+        Return the z-sorted slices of the scan to read the pixel data
+        from (see `pylidc.dicom_pixels.slice_pixels`), their z positions,
+        and the number of rows and columns of the images.
+
+        Slices in the DICOM catalog that can be memory-mapped are read
+        without parsing their headers, otherwise the images are loaded
+        with `load_all_dicom_images`.
+        """
+        images = self._dicom_catalog_records()
+        if images is not None and \
+           all(r.pixel_offset is not None and
+               r.rescale_slope is not None and
+               r.rescale_intercept is not None for r in images):
+            if verbose: print("Loading dicom files ... This may take a moment.")
+            zs = [r.z for r in images]
+            rows, cols = images[0].rows, images[0].cols
+        else:
+            images = self.load_all_dicom_images(verbose=verbose)
+            if len(images) == 0:
+                raise RuntimeError("Couldn't find DICOM images for %s."
+                                   % self)
+            zs = [float(x.ImagePositionPatient[-1]) for x in images]
+            rows, cols = int(images[0].Rows), int(images[0].Columns)
+        return images, zs, rows, cols
+
+    def _pixel_minimum(self, images):
+        """
+        Return the minimum stored pixel value (before rescaling, as read
+        by `pylidc.dicom_pixels.slice_pixels`) of the slices `images`
+        returned by `_pixel_sources`, without reading their pixel data.
+
+        The minimum of each slice is taken from the volume store (see
+        `pylidc.volume_store`) when the scan is in it. Otherwise, the
+        value of air (-1024 HU) is used for every slice.
+        """
+        minima = None
+        store = get_volume_store()
+        if store is not None and self.series_instance_uid in store:
+            minima = store.metadata(self.series_instance_uid).get('slice_min')
+        if minima is None or len(minima) != len(images):
+            minima = [_air_value] * len(images)
+
+        slope, intercept = np.array([_rescale(x) for x in images],
+                                    dtype=float).T
+        return float(np.min((np.asarray(minima) - intercept) / slope))
+
     def load_all_dicom_images(self, verbose=True):
         """
         Load all the DICOM images assocated with this scan and return as list.
@@ -286,15 +488,27 @@ class Scan(Base):
             plt.imshow(images[0].pixel_array, cmap=plt.cm.gray)
             plt.show()
 
+        If a DICOM catalog has been built (see
+        `pylidc.dicom_catalog.build_dicom_catalog`), only the files of the
+        de-duplicated, z-sorted slices listed in it are read.
         """
         if verbose: print("Loading dicom files ... This may take a moment.")
 
+        records = self._dicom_catalog_records()
+        if records is not None:
+            return [dicom.dcmread(r.path, defer_size=_defer_size)
+                    for r in records]
+
+        # Only the headers are read here. The pixel data of the slices
+        # that survive the filtering below is read when it is accessed,
+        # and that of the discarded files is never read.
         path = self.get_path_to_dicom_files()
         fnames = [fname for fname in os.listdir(path)
                             if fname.endswith('.dcm') and not fname.startswith(".")]
         images = []
         for fname in fnames:
-            image = dicom.dcmread(os.path.join(path,fname))
+            image = dicom.dcmread(os.path.join(path,fname),
+                                  defer_size=_defer_size)
 
             seid = str(image.SeriesInstanceUID).strip()
             stid = str(image.StudyInstanceUID).strip()
@@ -309,25 +523,12 @@ class Scan(Base):
         # Some scans contain multiple slices with the same `z` coordinate 
         # from the `ImagePositionPatient` tag.
         # The arbitrary choice to take the slice with lesser 
-        # `InstanceNumber` tag is made.
-        # This takes some work to accomplish...
+        # `InstanceNumber` tag is made (and the first file listed among
+        # slices with equal `InstanceNumber`). The result is sorted by
+        # (now unique) ImagePositionPatient z coordinate.
         zs    = [float(img.ImagePositionPatient[-1]) for img in images]
         inums = [float(img.InstanceNumber) for img in images]
-        inds = list(range(len(zs)))
-        while np.unique(zs).shape[0] != len(inds):
-            for i in inds:
-                for j in inds:
-                    if i!=j and zs[i] == zs[j]:
-                        k = i if inums[i] > inums[j] else j
-                        inds.pop(inds.index(k))
-
-        # Prune the duplicates found in the loops above.
-        zs     = [zs[i]     for i in range(len(zs))     if i in inds]
-        images = [images[i] for i in range(len(images)) if i in inds]
-
-        # Sort everything by (now unique) ImagePositionPatient z coordinate.
-        sort_inds = np.argsort(zs)
-        images    = [images[s] for s in sort_inds]
+        images = [images[i] for i in _unique_slice_order(zs, inums)]
         # End multiple z clean.
         # ##############################################
 
@@ -413,19 +614,29 @@ class Scan(Base):
             # => Nodule 4 has 4 annotations.
 
         """
+        from scipy.sparse.csgraph import connected_components
+
         assert 0 < factor < 1, "`factor` must be in the interval (0,1)."
 
-        def try_clustering(tol):
+        def distance_matrix():
             """
-            Attempts to cluster annotations with the given tolerance.
+            Computes the distances between all annotations.
             """
+            if pairwise is not None:
+                return pairwise(self.annotations)
+
             D = np.zeros((N, N))  # Distance matrix
 
             # Calculate distances between annotations
             for i in range(N):
                 for j in range(i+1, N):
                     D[i, j] = D[j, i] = metric(self.annotations[i], self.annotations[j])
+            return D
 
+        def try_clustering(tol):
+            """
+            Attempts to cluster annotations with the given tolerance.
+            """
             adjacency = D <= tol
             nnods, cids = connected_components(adjacency, directed=False)
             ucids = np.unique(cids)
@@ -434,9 +645,11 @@ class Scan(Base):
             return adjacency, nnods, cids, ucids, counts
 
         # Fetch the metric function if it's a string
+        pairwise = None
         if isinstance(metric, str):
             if metric not in metrics.keys():
                 raise ValueError(f"Invalid metric: {metric}. Available metrics are: {list(metrics.keys())}")
+            pairwise = pairwise_metrics.get(metric)
             metric = metrics[metric]
 
         N = len(self.annotations)
@@ -449,6 +662,9 @@ class Scan(Base):
         elif N == 1:
             return [[self.annotations[0]]]
 
+        # The distances do not depend on `tol`, so they are computed once.
+        D = distance_matrix()
+
         # Try clustering with retries
         retries = 0
         while retries < max_retries:
@@ -507,6 +723,9 @@ class Scan(Base):
             scan.visualize(annotation_groups=nodules)
 
         """
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider
+
         images = self.load_all_dicom_images()
 
         fig = plt.figure(figsize=(16,8))
@@ -613,7 +832,7 @@ class Scan(Base):
         plt.show()
         return sslice
 
-    @property
+    @memoized_property
     def slice_zvals(self):
         """
         The "z-values" for the slices of the scan (i.e.,
@@ -622,7 +841,72 @@ class Scan(Base):
         """
         return np.sort([z.val for z in self.zvals])
 
-    @property
+    def slice_indices(self, zvals):
+        """
+        Return the index of the scan slice nearest to each of the given
+        z-coordinates, i.e., `np.abs(scan.slice_zvals - z).argmin()` for 
+        each `z` (ties resolve to the lower index), using a single binary
+        search over the sorted `slice_zvals`.
+
+        Parameters
+        ----------
+        zvals: float or array-like of floats
+            The z-coordinates (e.g., `Contour.image_z_position` values).
+
+        Return
+        ------
+        ks: ndarray of ints
+            `ks[i]` is the slice index of `zvals[i]`.
+        """
+        zs = self.slice_zvals
+        zvals = np.asarray(zvals, dtype=float)
+        n = zs.shape[0]
+
+        # `right` is the first slice with z >= zval, `left` the one before.
+        right = np.searchsorted(zs, zvals, side='left')
+        left  = np.maximum(right-1, 0)
+        dleft  = np.where(right > 0, zvals - zs[left], np.inf)
+        dright = np.where(right < n, zs[np.minimum(right, n-1)] - zvals,
+                          np.inf)
+
+        # Repeated z values resolve to their first occurrence, like argmin.
+        left = np.searchsorted(zs, zs[left], side='left')
+        return np.where(dleft <= dright, left, right)
+
+    @memoized_method
+    def contour_k_indices(self):
+        """
+        Resolve the slice index (`Contour.image_k_position`) of all the 
+        contours of all the annotations of the scan at once.
+
+        Return
+        ------
+        ks: dict
+            `ks[contour.id]` is the slice index of `contour`. The 
+            dictionary is computed once per scan and shared, so it
+            should not be modified.
+        """
+        store = get_contour_store()
+        ids, zvals = [], []
+        for ann in self.annotations:
+            row = -1 if store is None else store.annotation_row(ann.id)
+            if row >= 0:
+                c0 = store.annotation_offsets[row]
+                c1 = store.annotation_offsets[row+1]
+                ids.append(store.contour_ids[c0:c1])
+                zvals.append(store.contour_z[c0:c1])
+            else:
+                ids.append([c.id for c in ann.contours])
+                zvals.append([c.image_z_position for c in ann.contours])
+
+        if len(ids) == 0:
+            return {}
+
+        ids = np.concatenate(ids).astype(int)
+        ks  = self.slice_indices(np.concatenate(zvals))
+        return dict(zip(ids.tolist(), ks))
+
+    @memoized_property
     def slice_spacing(self):
         """
         This computes the median of the difference
@@ -637,7 +921,7 @@ class Scan(Base):
         """
         return np.median(np.diff(self.slice_zvals))
 
-    @property
+    @memoized_property
     def spacings(self):
         """
         The spacings in the i, j, k image coordinate directions, as a 
@@ -647,17 +931,165 @@ class Scan(Base):
                          self.pixel_spacing,
                          self.slice_spacing])
 
-    def to_volume(self, verbose=True):
+    def to_volume(self, verbose=True, workers=None, dtype=np.int16,
+                  pool='thread', cache=True, k_range=None, ij_window=None):
         """
         Return the scan as a 3D numpy array volume.
+
+        The slices are decoded in parallel, and each one is rescaled
+        (`RescaleSlope` and `RescaleIntercept`) directly into the
+        preallocated volume.
+
+        With `k_range` and/or `ij_window`, only the corresponding part of
+        the volume is returned, and only the pixel data of the slices in
+        `k_range` is read (see also `Annotation.roi_volume`).
+
+        If the in-memory image cache is enabled (see
+        `pylidc.image_cache`), whole volumes are kept in it, and later
+        calls return copies of them. If the volume cache is enabled (see
+        `pylidc.configure_volume_cache`), int16 volumes are also stored
+        on disk after decoding, and later calls return a copy-on-write
+        `np.memmap` of the cached file instead.
+
+        If the scan is in the chunked volume store (see
+        `pylidc.volume_store`), int16 volumes are read from it instead of
+        the DICOM files, only decompressing the chunks of the requested
+        part of the volume.
+
+        Parameters
+        ----------
+        verbose: bool, default=True
+            Turn the loading statement on/off.
+
+        workers: int, default=None
+            The number of slice decoding workers. Defaults to the number
+            of CPUs.
+
+        dtype: numpy dtype, default=np.int16
+            The data type of the volume.
+
+        pool: string, default='thread'
+            Either 'thread' or 'process'. Threads share the volume and
+            are enough for uncompressed data; processes may be faster for
+            compressed transfer syntaxes whose decoders hold the GIL.
+
+        cache: bool, default=True
+            Use the image and volume caches and the volume store, if
+            enabled. Pass False to get a private, writable volume read
+            from the DICOM files.
+
+        k_range: slice or (start, stop), default=None
+            The range of slice indices to load. Defaults to all slices.
+
+        ij_window: pair of slices or of (start, stop) pairs, default=None
+            The in-plane window along the `i` and `j` axes. Defaults to
+            the whole slices.
+
+        Return
+        ------
+        volume: ndarray, shape=(rows, cols, slices)
+
+        Example
+        -------
+        The volume inside an annotation's bounding box, read without
+        decoding the other slices::
+
+            import pylidc as pl
+
+            ann = pl.query(pl.Annotation).first()
+            bb = ann.bbox()
+
+            roi = ann.scan.to_volume(k_range=bb[2], ij_window=bb[:2])
+            # Same as `ann.scan.to_volume()[bb]`.
         """
-        images = self.load_all_dicom_images(verbose=verbose)
+        if pool not in ('thread', 'process'):
+            raise ValueError("`pool` should be 'thread' or 'process'.")
+
+        k_range = _as_slice(k_range)
+        if ij_window is None:
+            ij_window = (slice(None), slice(None))
+        ij_window = (_as_slice(ij_window[0]), _as_slice(ij_window[1]))
+        whole = k_range == slice(None) and \
+                ij_window == (slice(None), slice(None))
+
+        memory = get_image_cache() if cache else None
+        memory_key = ('volume', self.series_instance_uid, np.dtype(dtype).str)
+        if memory is not None:
+            volume = memory.get(memory_key)
+            if volume is not None:
+                return volume.copy() if whole else \
+                       volume[ij_window + (k_range,)].copy()
+
+        store = get_volume_store() if cache else None
+        cache = get_volume_cache() if cache else None
+        if cache is not None and np.dtype(dtype) == np.int16:
+            volume = cache.get(self.series_instance_uid)
+            if volume is not None:
+                return volume if whole else volume[ij_window + (k_range,)]
+            # Only whole volumes are stored.
+            if not whole:
+                cache = None
+        else:
+            cache = None
+
+        if store is not None and np.dtype(dtype) == np.int16 and \
+           self.series_instance_uid in store:
+            volume = store.read(self.series_instance_uid,
+                                ij_window + (k_range,))
+            if memory is not None and whole:
+                memory.put(memory_key, freeze(volume.copy()), volume.nbytes)
+            return volume
+
+        images, zs, rows, cols = self._pixel_sources(verbose=verbose)
+        images = images[k_range]
+        window = None if whole else ij_window
+        shape = (len(range(*ij_window[0].indices(rows))),
+                 len(range(*ij_window[1].indices(cols))),
+                 len(images))
+        volume = np.empty(shape, dtype=dtype)
+        if len(images) == 0:
+            return volume
+
+        starts = list(range(0, len(images), _volume_block_size))
+        blocks = [images[k:k+_volume_block_size] for k in starts]
+        if pool == 'process' and not hasattr(blocks[0][0], 'pixel_offset'):
+            # Send the file names rather than the datasets to the workers.
+            blocks = [[x.filename for x in block] for block in blocks]
+        # The blocks hold the only references to the datasets from here,
+        # so that they are freed as soon as they are decoded.
+        del images
+
+        def write(k, block):
+            volume[:,:,k:k+block.shape[0]] = block.transpose(1, 2, 0)
+
+        workers = os.cpu_count() if workers is None else workers
+        workers = max(1, min(int(workers), len(blocks)))
+
+        if workers == 1:
+            for k, block in zip(starts, blocks):
+                write(k, _decode_slice_block(block, dtype, window))
+        elif pool == 'thread':
+            def task(k, block):
+                write(k, _decode_slice_block(block, dtype, window))
+            with ThreadPoolExecutor(workers) as executor:
+                list(executor.map(task, starts, blocks))
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                decoded = executor.map(_decode_slice_block, blocks,
+                                       [dtype]*len(blocks),
+                                       [window]*len(blocks))
+                for k, block in zip(starts, decoded):
+                    write(k, block)
+
+        if cache is not None:
+            cache.put(self.series_instance_uid, volume,
+                      dict(study_instance_uid=self.study_instance_uid,
+                           patient_id=self.patient_id,
+                           slice_zvals=zs,
+                           pixel_spacing=self.pixel_spacing,
+                           slice_spacing=float(self.slice_spacing)))
+
+        if memory is not None and whole:
+            memory.put(memory_key, freeze(volume.copy()), volume.nbytes)
 
-        volume = np.stack(
-            [
-                x.pixel_array * x.RescaleSlope + x.RescaleIntercept
-                for x in images
-            ],
-            axis=-1,
-        ).astype(np.int16)
         return volume
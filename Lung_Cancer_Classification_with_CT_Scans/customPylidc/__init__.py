@@ -24,13 +24,100 @@ __version__ = '0.2.3'
 
 # Hidden stuff.
 import os as _os
-import pkg_resources as _pr
+import threading as _threading
+import contextlib as _contextlib
+import importlib.util as _importlib_util
+from urllib.parse import quote as _quote
 from sqlalchemy import create_engine as _create_engine
+from sqlalchemy import event as _event
 from sqlalchemy.orm import sessionmaker as _sessionmaker
+from sqlalchemy.orm import scoped_session as _scoped_session
+from sqlalchemy.orm import selectinload as _selectinload
 
-_dbpath  = _pr.resource_filename('pylidc', 'pylidc.sqlite')
-_engine  = _create_engine('sqlite:///'+_dbpath)
-_session = _sessionmaker(bind=_engine)()
+# Locate the database shipped with pylidc without importing pylidc itself
+# (which would eagerly pull in matplotlib and scipy).
+_dbpath  = _os.path.join(
+    _importlib_util.find_spec('pylidc').submodule_search_locations[0],
+    'pylidc.sqlite')
+
+# Engine and session configuration, see `configure`. A `dbpath` of None
+# selects the optimized local copy of the database when it has been built
+# (see `pylidc.database`), and the packaged database otherwise.
+_config = dict(dbpath=None, read_only=True, poolclass=None,
+               pool_size=5, max_overflow=-1, mmap_size=None,
+               engine_kwargs={})
+
+# The engine and the thread-scoped session registry are created lazily, 
+# and re-created in a forked child process (`_pid` != current pid).
+_engine  = None
+_Session = None
+_pid     = None
+_lock    = _threading.Lock()
+
+def _database_url(dbpath, read_only):
+    if not read_only:
+        return 'sqlite:///' + dbpath
+    # `immutable=1` tells SQLite the file can't change, so no locks are 
+    # taken and concurrent readers do not contend.
+    return ('sqlite:///file:%s?mode=ro&immutable=1&uri=true'
+            % _quote(_os.path.abspath(dbpath)))
+
+def _resolve_database():
+    """
+    Return the database path and `mmap_size` pragma value to use.
+    """
+    dbpath, mmap_size = _config['dbpath'], _config['mmap_size']
+    if dbpath is None:
+        from .database import get_optimized_database, default_mmap_size
+        dbpath = get_optimized_database(_dbpath)
+        if dbpath is None:
+            dbpath = _dbpath
+        elif mmap_size is None:
+            mmap_size = default_mmap_size
+    return dbpath, mmap_size
+
+def _get_registry():
+    global _engine, _Session, _pid
+    if _pid != _os.getpid():
+        with _lock:
+            if _pid != _os.getpid():
+                if _engine is not None:
+                    # Inherited from the parent process: drop the pooled
+                    # connections without closing the parent's ones.
+                    _engine.dispose(close=False)
+
+                kwargs = dict(_config['engine_kwargs'])
+                if _config['poolclass'] is not None:
+                    kwargs['poolclass'] = _config['poolclass']
+                else:
+                    kwargs['pool_size']    = _config['pool_size']
+                    kwargs['max_overflow'] = _config['max_overflow']
+
+                dbpath, mmap_size = _resolve_database()
+                _engine  = _create_engine(
+                    _database_url(dbpath, _config['read_only']), **kwargs)
+
+                if mmap_size is not None:
+                    def set_mmap_size(dbapi_connection, connection_record):
+                        dbapi_connection.execute('PRAGMA mmap_size = %d'
+                                                 % int(mmap_size))
+                    _event.listen(_engine, 'connect', set_mmap_size)
+
+                _Session = _scoped_session(_sessionmaker(bind=_engine))
+                _pid     = _os.getpid()
+    return _Session
+
+def _reset_engine():
+    """
+    Close the sessions and the engine of the current process, so that 
+    they are re-created (with the current configuration) on next use.
+    """
+    global _pid
+    with _lock:
+        if _Session is not None and _pid == _os.getpid():
+            _Session.remove()
+            _engine.dispose()
+        _pid = None
 
 # Public stuff.
 from .Scan       import Scan, ClusterError
@@ -40,6 +127,13 @@ from .Zval       import Zval
 
 from .Annotation import feature_names as annotation_feature_names
 
+from ._memo import cache_info       as geometry_cache_info
+from ._memo import reset_cache_info as reset_geometry_cache_info
+
+from .volume_cache import configure_volume_cache, volume_cache_info
+from .image_cache  import configure_image_cache, image_cache, \
+                          image_cache_info, clear_image_cache
+
 def query(*args):
     """
     Wraps the sqlalchemy session object. Some example usage::
@@ -62,5 +156,292 @@ def query(*args):
         ann = anns.first()
         print(ann.volume)
         # => 5230.33874999
+
+    The session is scoped to the calling thread (and process), so `query`
+    can be used concurrently from thread and process pools.
+    """
+    return get_session().query(*args)
+
+def configure(dbpath=None, read_only=True, poolclass=None, pool_size=5,
+              max_overflow=-1, mmap_size=None, **engine_kwargs):
+    """
+    Configure the database connection used by `query` and the other
+    session functions. Existing sessions are closed, and new ones are 
+    created on demand with the new configuration.
+
+    Parameters
+    ----------
+    dbpath: string, default=None
+        Path to the pylidc sqlite database. The default, None, uses the
+        optimized local copy of the database if it has been built (see 
+        :func:`pylidc.database.build_optimized_database`) and the database
+        packaged with pylidc otherwise.
+
+    read_only: bool, default=True
+        Open the database file read-only and immutable (SQLite URI 
+        parameters `mode=ro&immutable=1`), so that many threads and 
+        processes can read it without any locking.
+
+    poolclass: sqlalchemy Pool subclass, default=None
+        The connection pool class. If None, sqlalchemy's `QueuePool` 
+        is used with the `pool_size` and `max_overflow` arguments below.
+
+    pool_size: int, default=5
+        Number of connections kept open in the pool.
+
+    max_overflow: int, default=-1
+        Number of connections allowed on top of `pool_size` (-1 means 
+        no limit, so that every worker thread can hold its own 
+        session).
+
+    mmap_size: int, default=None
+        If not None, the `PRAGMA mmap_size` (in bytes) set on every new
+        connection. The optimized local copy of the database uses 256 MB
+        by default.
+
+    engine_kwargs: args
+        Further keyword arguments passed to `sqlalchemy.create_engine`.
+    """
+    with _lock:
+        _config.update(dbpath=dbpath, read_only=read_only,
+                       poolclass=poolclass, pool_size=pool_size,
+                       max_overflow=max_overflow, mmap_size=mmap_size,
+                       engine_kwargs=engine_kwargs)
+    _reset_engine()
+
+def get_engine():
+    """
+    Return the sqlalchemy engine of the current process.
+    """
+    _get_registry()
+    return _engine
+
+def get_session():
+    """
+    Return the sqlalchemy session of the current thread (created on first
+    use). Each thread, and each process after a `fork`, gets its own 
+    session, so identity maps are never shared between workers.
+    """
+    return _get_registry()()
+
+def remove_session():
+    """
+    Close and discard the session of the current thread, e.g., at the 
+    end of a worker's task. A new one is created by the next query.
+    """
+    _get_registry().remove()
+
+def new_session():
+    """
+    Return a new session that is not tied to the current thread. The
+    caller is responsible for closing it.
+    """
+    return _get_registry().session_factory()
+
+@_contextlib.contextmanager
+def session_scope():
+    """
+    Context manager providing a new session that is closed on exit::
+
+        import pylidc as pl
+
+        with pl.session_scope() as session:
+            scan = session.query(pl.Scan).first()
+            print(scan.slice_spacing)
+    """
+    session = new_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def load_scans(patient_ids=None, with_annotations=True, with_contours=True,
+               with_zvals=True):
+    """
+    Bulk load scans together with their related objects. Instead of
+    lazily issuing one SQL query per `scan.annotations`, 
+    `annotation.contours` and `scan.zvals` access, the whole object 
+    graph is fetched with a handful of set-based `SELECT ... IN (...)`
+    queries, and the returned objects are fully hydrated.
+
+    Parameters
+    ----------
+    patient_ids: string or list of strings, default=None
+        The patient ids (of the form "LIDC-IDRI-dddd") of the scans 
+        to load. If None (the default), all the scans are loaded.
+
+    with_annotations: bool, default=True
+        Eagerly load the `annotations` of each scan.
+
+    with_contours: bool, default=True
+        Eagerly load the `contours` of each annotation. Ignored 
+        if `with_annotations` is False.
+
+    with_zvals: bool, default=True
+        Eagerly load the `zvals` of each scan (used by `slice_zvals`,
+        `slice_spacing`, and the contour `k` index lookups).
+
+    Return
+    ------
+    scans: list of :class:`pylidc.Scan` objects
+        The scans, sorted by their `id`.
+
+    Example
+    -------
+    An example::
+
+        import pylidc as pl
+
+        scans = pl.load_scans(['LIDC-IDRI-0078', 'LIDC-IDRI-0101'])
+
+        # No more SQL queries are issued below.
+        for scan in scans:
+            for ann in scan.annotations:
+                print(ann.volume)
+    """
+    q = query(Scan)
+
+    if patient_ids is not None:
+        if isinstance(patient_ids, str):
+            patient_ids = [patient_ids]
+        q = q.filter(Scan.patient_id.in_(list(patient_ids)))
+
+    options = _load_options(with_annotations, with_contours, with_zvals)
+    return q.options(*options).order_by(Scan.id).all()
+
+def _load_options(with_annotations=True, with_contours=True, with_zvals=True):
+    # The many-to-one back-references (`annotation.scan`,
+    # `contour.annotation`) are set from the identity map, without SQL,
+    # so that the objects stay usable once their session is closed.
+    options = []
+    if with_annotations:
+        annotations = _selectinload(Scan.annotations)
+        options.append(annotations.immediateload(Annotation.scan))
+        if with_contours:
+            options.append(annotations.selectinload(Annotation.contours)
+                                      .immediateload(Contour.annotation))
+    if with_zvals:
+        options.append(_selectinload(Scan.zvals)
+                       .immediateload(Zval.scan))
+    return options
+
+def _load_patient(patient_id, load_volume, volume_kwargs):
+    """
+    Load the scans (and volumes) of a patient in a new session, which is
+    returned open, for `iter_scans`.
     """
-    return _session.query(*args)
+    session = new_session()
+    try:
+        scans = session.query(Scan)\
+                       .filter(Scan.patient_id == patient_id)\
+                       .options(*_load_options())\
+                       .order_by(Scan.id).all()
+        volumes = [scan.to_volume(verbose=False, **volume_kwargs)
+                   if load_volume else None for scan in scans]
+    except BaseException:
+        session.close()
+        raise
+    return session, scans, volumes
+
+def _close_loaded_session(future):
+    """Close the session of a `_load_patient` future once it is done."""
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+def iter_scans(patient_ids=None, prefetch=2, load_volume=True, ordered=True,
+               **volume_kwargs):
+    """
+    Iterate over the scans of a list of patients while the next ones are
+    loaded on background threads, so that database and DICOM I/O overlap
+    with the caller's processing.
+
+    Parameters
+    ----------
+    patient_ids: list of strings, default=None
+        The patient ids (of the form "LIDC-IDRI-dddd") to iterate over.
+        If None (the default), all the patients are used, sorted by id.
+
+    prefetch: int, default=2
+        The number of patients loaded ahead of the one being processed.
+        At most `prefetch` + 1 patients are held in memory at a time
+        (plus the image cache, if it has been enabled, see
+        `pylidc.image_cache`).
+
+    load_volume: bool, default=True
+        Also load the volume of each scan (with :meth:`Scan.to_volume`).
+
+    ordered: bool, default=True
+        If True, the scans are yielded in the order of `patient_ids`.
+        Otherwise, the patients are yielded as soon as they are loaded.
+
+    volume_kwargs: args
+        Further keyword arguments passed to :meth:`Scan.to_volume`.
+
+    Return
+    ------
+    scans: generator
+        Yields `(scan, volume)` tuples if `load_volume` is True, and the
+        scans otherwise. The scans of a patient are yielded together,
+        sorted by their `id`, with their annotations, contours and zvals
+        loaded (see `load_scans`). Their session is closed when the
+        iteration moves on to the next patient, and the scans kept by
+        the caller remain usable without it.
+
+    Example
+    -------
+    An example::
+
+        import pylidc as pl
+
+        for scan, vol in pl.iter_scans(['LIDC-IDRI-0078', 'LIDC-IDRI-0101']):
+            for ann in scan.annotations:
+                print(ann.id, vol[ann.bbox()].mean())
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    if patient_ids is None:
+        patient_ids = [pid for pid, in query(Scan.patient_id).distinct()
+                                          .order_by(Scan.patient_id)]
+    elif isinstance(patient_ids, str):
+        patient_ids = [patient_ids]
+
+    prefetch = max(1, int(prefetch))
+    remaining = iter(patient_ids)
+    pending = deque()
+    executor = ThreadPoolExecutor(prefetch)
+
+    def submit():
+        for patient_id in remaining:
+            pending.append(executor.submit(_load_patient, patient_id,
+                                           load_volume, volume_kwargs))
+            return
+
+    try:
+        for _ in range(prefetch):
+            submit()
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+
+            session, scans, volumes = future.result()
+            submit()
+            try:
+                for scan, volume in zip(scans, volumes):
+                    yield (scan, volume) if load_volume else scan
+            finally:
+                session.close()
+    finally:
+        # Early exit (or error): drop what was not yielded, closing the
+        # session of each patient loaded (or being loaded) meanwhile.
+        for future in pending:
+            if not future.cancel():
+                future.add_done_callback(_close_loaded_session)
+        executor.shutdown(wait=False)
+
@@ -0,0 +1,128 @@
+"""
+Per-instance memoization of the derived quantities of the model
+objects (e.g., `Annotation.contours_matrix` or `Scan.slice_zvals`).
+
+Computed values are stored on the instance itself (outside of the
+sqlalchemy-managed attributes), so they live as long as the object does,
+or until its `clear_cache` method is called. Memoized arrays are kept
+read-only, and every access returns a writable copy of them, so callers
+can modify the result as before. Hits and misses are counted per
+quantity, see `cache_info`.
+"""
+import inspect
+import functools
+from collections import Counter
+
+import numpy as np
+
+_hits   = Counter()
+_misses = Counter()
+
+_memo_attr = '_memo'
+
+
+def _cache_of(obj):
+    # Write straight into `__dict__` so that neither the read-only
+    # `__setattr__` checks of the models nor sqlalchemy get involved.
+    try:
+        return obj.__dict__[_memo_attr]
+    except KeyError:
+        cache = obj.__dict__[_memo_attr] = {}
+        return cache
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    return value
+
+
+def _thaw(value):
+    # Memoized arrays are shared, each caller gets its own copy.
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    return value
+
+
+def _hashable(value):
+    """
+    Turn (nested) lists into tuples, tagging values with their type since
+    e.g. `pad=30` and `pad=30.0` mean different things. Raises TypeError
+    for values that cannot be used as a cache key, e.g., NumPy arrays.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    hash(value)
+    return (type(value), value)
+
+
+def memoized_property(func):
+    """
+    Like `property`, but the value is computed only once per instance.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def getter(self):
+        cache = _cache_of(self)
+        try:
+            value = cache[name]
+        except KeyError:
+            _misses[name] += 1
+            value = cache[name] = _freeze(func(self))
+            return _thaw(value)
+        _hits[name] += 1
+        return _thaw(value)
+
+    return property(getter)
+
+
+def memoized_method(func):
+    """
+    Memoize a method per instance and per (normalized) argument values.
+    Calls with arguments that cannot be hashed (e.g., arrays) are not
+    cached.
+    """
+    name = func.__qualname__
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        try:
+            key = (name, _hashable(list(bound.arguments.values())[1:]))
+        except TypeError:
+            return func(self, *args, **kwargs)
+
+        cache = _cache_of(self)
+        try:
+            value = cache[key]
+        except KeyError:
+            _misses[name] += 1
+            value = cache[key] = _freeze(func(self, *args, **kwargs))
+            return _thaw(value)
+        _hits[name] += 1
+        return _thaw(value)
+
+    return wrapper
+
+
+def clear(obj):
+    """Drop all the memoized values of `obj`."""
+    obj.__dict__.pop(_memo_attr, None)
+
+
+def cache_info():
+    """
+    Return the memoization counters as a dictionary mapping the
+    qualified name of each memoized quantity to a `(hits, misses)` tuple.
+    """
+    names = sorted(set(_hits) | set(_misses))
+    return dict((name, (_hits[name], _misses[name])) for name in names)
+
+
+def reset_cache_info():
+    """Reset the hit/miss counters."""
+    _hits.clear()
+    _misses.clear()
@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.spatial.distance import cdist
 
 metrics = {}
 
@@ -12,6 +11,8 @@ def pairdist(ann1, ann2, which):
     which: str
         One of 'min', 'max', or 'avg'.
     """
+    from scipy.spatial.distance import cdist
+
     dists = cdist(ann1.contours_matrix,
                   ann2.contours_matrix)
 
@@ -82,12 +83,54 @@ def hausdorff(ann1, ann2):
 
     [1]: https://en.wikipedia.org/wiki/Hausdorff_distance
     """
+    from scipy.spatial.distance import cdist
+
     C = cdist(ann1.contours_matrix,
               ann2.contours_matrix)
     return max(C.min(0).max(), C.min(1).max())
 
 metrics['hausdorff'] = hausdorff
 
+def _overlap_counts(anns):
+    """
+    Return the number of voxels of each annotation, `sizes[i]`, and
+    the number of voxels shared by each pair, `shared[i,j]`, with the
+    voxels defined as in `Annotation._as_set`.
+
+    The shared voxels are only counted for the pairs whose bounding
+    boxes intersect, on the intersection of their boolean masks.
+    """
+    masks = [ann._overlap_mask() for ann in anns]
+    n = len(masks)
+
+    sizes = np.array([np.count_nonzero(m) for m,_,_ in masks], dtype=int)
+    shared = np.diag(sizes)
+    if n < 2:
+        return sizes, shared
+
+    lo = np.array([o for _,o,_ in masks])
+    hi = lo + np.array([m.shape[:2] for m,_,_ in masks])
+    zlo = np.array([z[0] for _,_,z in masks])
+    zhi = np.array([z[-1] for _,_,z in masks])
+
+    # Pairs of annotations whose bounding boxes intersect.
+    meets = (lo[:,None] < hi[None]).all(-1) & (lo[None] < hi[:,None]).all(-1)
+    meets &= (zlo[:,None] <= zhi[None]) & (zlo[None] <= zhi[:,None])
+
+    for a, b in zip(*np.nonzero(np.triu(meets, 1))):
+        (ma, oa, za), (mb, ob, zb) = masks[a], masks[b]
+        _, ka, kb = np.intersect1d(za, zb, assume_unique=True,
+                                   return_indices=True)
+        if len(ka) == 0:
+            continue
+        i0, j0 = np.maximum(oa, ob)
+        i1, j1 = np.minimum(oa + ma.shape[:2], ob + mb.shape[:2])
+        A = ma[i0-oa[0]:i1-oa[0], j0-oa[1]:j1-oa[1]][:,:,ka]
+        B = mb[i0-ob[0]:i1-ob[0], j0-ob[1]:j1-ob[1]][:,:,kb]
+        shared[a,b] = shared[b,a] = np.count_nonzero(A & B)
+
+    return sizes, shared
+
 def jaccard(ann1, ann2):
     """
     The Jaccard distance [1] between the boolean volumes as point sets. The
@@ -97,9 +140,68 @@ def jaccard(ann1, ann2):
 
     [1]: https://en.wikipedia.org/wiki/Jaccard_index
     """
-    A1 = ann1._as_set()
-    A2 = ann2._as_set()
-    I = len(A1.intersection(A2))
-    return 1.0 - I*1.0 / len(A1.union(A2))
+    sizes, shared = _overlap_counts([ann1, ann2])
+    I = int(shared[0,1])
+    return 1.0 - I*1.0 / int(sizes[0] + sizes[1] - I)
 
 metrics['jaccard'] = jaccard
+
+def dice(ann1, ann2):
+    """
+    The Dice distance [1] between the boolean volumes, i.e., one minus
+    twice the size of the intersection over the sum of the sizes.
+
+    [1]: https://en.wikipedia.org/wiki/Sorensen-Dice_coefficient
+    """
+    sizes, shared = _overlap_counts([ann1, ann2])
+    return 1.0 - 2.0*int(shared[0,1]) / int(sizes[0] + sizes[1])
+
+metrics['dice'] = dice
+
+def overlap(ann1, ann2):
+    """
+    One minus the volume overlap (or Szymkiewicz-Simpson) coefficient of
+    the boolean volumes: the size of the intersection over the size of
+    the smaller volume. Distance 0 indicates that one volume contains
+    the other.
+    """
+    sizes, shared = _overlap_counts([ann1, ann2])
+    return 1.0 - int(shared[0,1])*1.0 / int(min(sizes))
+
+metrics['overlap'] = overlap
+
+def pairwise_overlap(anns, which='jaccard'):
+    """
+    Compute the overlap distances between all pairs of a list of
+    annotations at once (see `jaccard`, `dice` and `overlap`).
+
+    which: str
+        One of 'jaccard', 'dice', or 'overlap'.
+
+    Return
+    ------
+    D: ndarray, shape=(len(anns), len(anns))
+        `D[i,j]` is equal to `metrics[which](anns[i], anns[j])`.
+        Pairs of empty volumes give NaN instead of raising
+        ZeroDivisionError.
+    """
+    sizes, shared = _overlap_counts(anns)
+
+    if   which == 'jaccard':
+        num, denom = shared, sizes[:,None] + sizes[None] - shared
+    elif which == 'dice':
+        num, denom = 2.0*shared, sizes[:,None] + sizes[None]
+    elif which == 'overlap':
+        num, denom = shared, np.minimum(sizes[:,None], sizes[None])
+    else:
+        raise ValueError('invalid `which` value.')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1.0 - num / denom
+
+# Metrics that can be computed for all the pairs of a list of annotations
+# at once (see `Scan.cluster_annotations`).
+pairwise_metrics = {}
+pairwise_metrics['jaccard'] = lambda anns: pairwise_overlap(anns, 'jaccard')
+pairwise_metrics['dice']    = lambda anns: pairwise_overlap(anns, 'dice')
+pairwise_metrics['overlap'] = lambda anns: pairwise_overlap(anns, 'overlap')
@@ -0,0 +1,14 @@
+"""
+Benchmarks of the customPylidc optimizations.
+
+Each module is a script comparing an optimized code path with the one
+it replaced (or with its slow fallback), and printing the timings. Run
+them from the directory containing the `customPylidc` package, e.g.::
+
+    python -m customPylidc.benchmarks.bulk_loading --patients 100
+
+The benchmarks that read images need the LIDC-IDRI DICOM files of the
+patients they use (see the `[dicom]` section of `~/.pylidcrc`), except
+`lazy_dicom_loading`, which writes a synthetic series to a temporary
+directory.
+"""
@@ -0,0 +1,118 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import time
+
+import numpy as np
+
+
+def timed(func, *args, **kwargs):
+    """Return the run time of `func(*args, **kwargs)` and its result."""
+    t = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - t, result
+
+
+def best_of(func, repeat=3):
+    """Return the shortest run time of `func()` over `repeat` runs."""
+    return min(timed(func)[0] for _ in range(repeat))
+
+
+def median_time(func, items):
+    """Return the median run time of `func(item)` over `items`."""
+    return float(np.median([timed(func, item)[0] for item in items]))
+
+
+def print_table(header, rows):
+    """Print `rows` (lists of strings) as left-aligned columns."""
+    rows = [header] + [[str(v) for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(row, widths)).rstrip())
+
+
+def sample_patients(n, seed=0):
+    """Return `n` random patient ids of the database, sorted."""
+    import customPylidc as pl
+
+    pids = sorted(pid for pid, in pl.query(pl.Scan.patient_id).distinct())
+    rng = np.random.default_rng(seed)
+    n = min(n, len(pids))
+    return sorted(rng.choice(pids, n, replace=False).tolist())
+
+
+def write_series(directory, study_uid, series_uid, zs, duplicates=0,
+                 shape=(512, 512), intercept=-1024, seed=0):
+    """
+    Write a synthetic CT series of uncompressed int16 slices at the
+    positions `zs`, plus `duplicates` slices repeating some of the
+    positions with higher `InstanceNumber`s. Return the file paths.
+
+    The stored value of the pixel (i, j) of the n-th file written is
+    `(i + j + n) % 2000`, rescaled with a slope of 1 and `intercept`.
+    """
+    import os
+    import pydicom
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    rng = np.random.default_rng(seed)
+    items = [(float(z), n+1) for n, z in enumerate(zs)]
+    for n in rng.choice(len(zs), duplicates, replace=False):
+        items.append((float(zs[n]), len(items)+1))
+    items = [items[n] for n in rng.permutation(len(items))]
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    ii, jj = np.indices(shape)
+    paths = []
+    for n, (z, inum) in enumerate(items):
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.2'
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+        path = os.path.join(directory, '1-%03d.dcm' % (n+1))
+        ds = FileDataset(path, {}, file_meta=meta, preamble=b'\0'*128)
+        ds.SOPClassUID = meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+        ds.StudyInstanceUID = study_uid
+        ds.SeriesInstanceUID = series_uid
+        ds.Modality = 'CT'
+        ds.ImagePositionPatient = [-150.0, -150.0, z]
+        ds.InstanceNumber = inum
+        ds.PixelSpacing = [0.7, 0.7]
+        ds.SliceThickness = 2.5
+        ds.RescaleSlope = 1
+        ds.RescaleIntercept = intercept
+        ds.Rows, ds.Columns = shape
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = 'MONOCHROME2'
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 1
+        ds.PixelData = ((ii + jj + n) % 2000).astype('<i2').tobytes()
+        try:
+            ds.save_as(path, enforce_file_format=True)
+        except TypeError:
+            # pydicom < 3.0
+            ds.is_little_endian, ds.is_implicit_VR = True, False
+            ds.save_as(path, write_like_original=False)
+        paths.append(path)
+    return paths
+
+
+def bytes_read():
+    """
+    Return the number of bytes read by the process so far (Linux only),
+    or None.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar'):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return None
@@ -0,0 +1,64 @@
+"""
+The implementations replaced by the customPylidc optimizations, kept as
+references for the benchmarks and the equivalence tests.
+"""
+import numpy as np
+import matplotlib.path as mplpath
+
+
+def previous_unique_slice_order(zs, inums):
+    """
+    The previous duplicate-z pruning loop of
+    `Scan.load_all_dicom_images`, returning the kept indices sorted by z.
+    """
+    inds = list(range(len(zs)))
+    while np.unique(zs).shape[0] != len(inds):
+        for i in inds:
+            for j in inds:
+                if i!=j and zs[i] == zs[j]:
+                    k = i if inums[i] > inums[j] else j
+                    inds.pop(inds.index(k))
+
+    kept = [i for i in range(len(zs)) if i in inds]
+    return [kept[s] for s in np.argsort([zs[i] for i in kept])]
+
+
+def previous_boolean_mask(ann, pad=None, bbox=None,
+                          include_contour_points=False):
+    """
+    The previous `Annotation.boolean_mask`, testing the grid points
+    against one `matplotlib.path.Path` per contour.
+    """
+    bb = ann.bbox_matrix(pad=pad) if bbox is None else bbox
+
+    czs = ann.contour_slice_zvals
+    cks = ann.contour_slice_indices
+    z_to_index = lambda z: dict(zip(czs,cks))[z] - bb[2,0]
+
+    ni,nj,nk = np.diff(bb, axis=1).astype(int)[:,0] + 1
+    mask = np.zeros((ni,nj,nk), dtype=bool)
+
+    ii,jj = np.indices(mask.shape[:2])
+    test_points = bb[:2,0] + np.c_[ii.flatten(), jj.flatten()]
+
+    for inclusion in (True, False):
+        for contour in ann.contours:
+            if contour.inclusion != inclusion:
+                continue
+            zi = z_to_index(contour.image_z_position)
+            C  = contour.to_matrix(include_k=False)
+            if (C[0] != C[-1]).any():
+                C = np.append(C, C[0].reshape(1,2), axis=0)
+
+            path = mplpath.Path(C, closed=True)
+            contains_pts = path.contains_points(test_points)
+            contains_pts = contains_pts.reshape(mask.shape[:2])
+            if inclusion:
+                mask[:,:,zi] = np.logical_or(mask[:,:,zi], contains_pts)
+            else:
+                mask[:,:,zi] = np.logical_and(mask[:,:,zi], ~contains_pts)
+
+            if not inclusion or not include_contour_points:
+                i, j = (C - bb[:2,0]).T
+                mask[i,j,np.ones(C.shape[0], dtype=int)*zi] = False
+    return mask
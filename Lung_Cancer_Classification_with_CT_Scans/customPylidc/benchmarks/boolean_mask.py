@@ -0,0 +1,47 @@
+"""
+Time of `Annotation.boolean_mask` (scanline fill) and of the previous
+implementation (one `matplotlib.path.Path.contains_points` test of the
+whole bounding box per contour), over a random sample of annotations
+and over the largest nodules in it.
+
+    python -m customPylidc.benchmarks.boolean_mask [--annotations 500]
+"""
+import argparse
+
+import numpy as np
+
+import customPylidc as pl
+from customPylidc.benchmarks._reference import previous_boolean_mask
+from customPylidc.benchmarks._common import median_time, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--annotations', type=int, default=500)
+    parser.add_argument('--largest', type=int, default=20)
+    args = parser.parse_args()
+
+    ids = [i for i, in pl.query(pl.Annotation.id)]
+    rng = np.random.default_rng(0)
+    ids = rng.choice(ids, min(args.annotations, len(ids)), replace=False)
+    anns = pl.query(pl.Annotation)\
+             .filter(pl.Annotation.id.in_(ids.tolist())).all()
+    for ann in anns:
+        assert np.array_equal(ann.boolean_mask(), previous_boolean_mask(ann))
+    largest = sorted(anns, key=lambda ann: -np.prod(ann.bbox_dims()))
+    largest = largest[:args.largest]
+
+    rows = []
+    for name, items in (('%d random annotations' % len(anns), anns),
+                        ('%d largest of them' % len(largest), largest)):
+        before = median_time(previous_boolean_mask, items)
+        after = median_time(lambda ann: ann.boolean_mask(), items)
+        rows.append([name, '%.2f ms' % (before*1e3), '%.2f ms' % (after*1e3),
+                     '%.1fx' % (before / after)])
+    print("Median time per annotation (masks checked identical)")
+    print_table(['annotations', 'Path.contains_points', 'scanline fill',
+                 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Number of SQL queries and time taken to load the scans of a list of
+patients with all their annotations, contours and z values: lazily
+(one `query` per patient, then one query per relationship access), or
+in bulk with `load_scans`.
+
+    python -m customPylidc.benchmarks.bulk_loading [--patients 100]
+"""
+import argparse
+import contextlib
+
+from sqlalchemy import event
+
+import customPylidc as pl
+from customPylidc.benchmarks._common import timed, print_table, \
+                                            sample_patients
+
+
+@contextlib.contextmanager
+def count_queries():
+    """Count the SQL statements executed in the block."""
+    counter = [0]
+
+    def before_cursor_execute(*args):
+        counter[0] += 1
+
+    engine = pl.get_engine()
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def lazy(patient_ids):
+    return [scan for pid in patient_ids
+            for scan in pl.query(pl.Scan).filter(pl.Scan.patient_id == pid)]
+
+
+def touch(scans):
+    """Access everything the feature extraction reads."""
+    for scan in scans:
+        scan.slice_zvals
+        for ann in scan.annotations:
+            for contour in ann.contours:
+                contour.image_z_position
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--patients', type=int, default=100)
+    args = parser.parse_args()
+
+    patient_ids = sample_patients(args.patients)
+    rows = []
+    for name, load in (('lazy per-patient queries', lazy),
+                       ('pl.load_scans', pl.load_scans)):
+        pl.remove_session()
+        with count_queries() as queries:
+            seconds, _ = timed(lambda: touch(load(patient_ids)))
+        rows.append([name, queries[0], '%.2f s' % seconds])
+
+    print("%d patients" % len(patient_ids))
+    print_table(['loading', 'queries', 'time'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Per-query latency of the access pattern of `extractPylidcFeatures`
+(a scan by `patient_id`, then its `annotations`, `zvals` and the
+`contours` of each annotation), on the packaged pylidc database and
+on its optimized local copy (see `customPylidc.database`).
+
+    python -m customPylidc.benchmarks.database_queries [--patients 50]
+
+The optimized copy is built first if it does not exist yet.
+"""
+import os
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+import customPylidc as pl
+from customPylidc import database
+from customPylidc.benchmarks._common import timed, print_table, \
+                                            sample_patients
+
+
+def run(patient_ids):
+    """
+    Return the latencies (in seconds) of each kind of query, with a
+    fresh session per patient so that nothing is served from the
+    identity map.
+    """
+    latencies = defaultdict(list)
+    for pid in patient_ids:
+        pl.remove_session()
+        t, scan = timed(lambda: pl.query(pl.Scan)
+                                  .filter(pl.Scan.patient_id == pid).first())
+        latencies['scan by patient_id'].append(t)
+        t, anns = timed(lambda: list(scan.annotations))
+        latencies['scan.annotations'].append(t)
+        t, _ = timed(lambda: list(scan.zvals))
+        latencies['scan.zvals'].append(t)
+        for ann in anns:
+            t, _ = timed(lambda: list(ann.contours))
+            latencies['annotation.contours'].append(t)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--patients', type=int, default=50)
+    args = parser.parse_args()
+
+    patient_ids = sample_patients(args.patients)
+    optimized = database.optimized_database_path()
+    if not os.path.exists(optimized):
+        database.build_optimized_database()
+
+    results = []
+    for dbpath, mmap_size in ((pl._dbpath, None),
+                              (optimized, database.default_mmap_size)):
+        pl.configure(dbpath=dbpath, mmap_size=mmap_size)
+        run(patient_ids[:5])  # Warm up the page cache.
+        results.append(run(patient_ids))
+    pl.configure()
+
+    print("Median latency over %d patients" % len(patient_ids))
+    print_table(['query', 'packaged', 'optimized copy'],
+                [[name, '%.1f ms' % (np.median(results[0][name])*1e3),
+                  '%.1f ms' % (np.median(results[1][name])*1e3)]
+                 for name in results[0]])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Time of the duplicate-z slice pruning of `Scan.load_all_dicom_images`
+(`_unique_slice_order`) and of the quadratic loop it replaced, on
+series with many duplicated positions.
+
+    python -m customPylidc.benchmarks.duplicate_slices
+"""
+import random
+
+from customPylidc.Scan import _unique_slice_order
+from customPylidc.benchmarks._reference import previous_unique_slice_order
+from customPylidc.benchmarks._common import best_of, print_table
+
+
+def series(nslices, nduplicates, seed):
+    """
+    Positions of a series of `nslices` files, `nduplicates` of which
+    repeat the position of another one with a higher InstanceNumber,
+    in a random file order.
+    """
+    rng = random.Random(seed)
+    n = nslices - nduplicates
+    items = [(2.5*i, i+1) for i in range(n)]
+    items += [(2.5*i, n+j+1)
+              for j, i in enumerate(rng.sample(range(n), nduplicates))]
+    rng.shuffle(items)
+    return [float(z) for z, _ in items], [float(k) for _, k in items]
+
+
+def main():
+    rows = []
+    for nslices, nduplicates in ((300, 100), (600, 300), (1200, 600)):
+        # The previous loop fails on some file orders, see the tests.
+        for seed in range(100):
+            zs, inums = series(nslices, nduplicates, seed)
+            try:
+                expected = previous_unique_slice_order(zs, inums)
+                break
+            except ValueError:
+                continue
+        else:
+            raise RuntimeError("No file order the previous loop handles.")
+        assert _unique_slice_order(zs, inums) == expected
+
+        before = best_of(lambda: previous_unique_slice_order(zs, inums))
+        after = best_of(lambda: _unique_slice_order(zs, inums), 10)
+        rows.append([nslices, nduplicates, '%.2f ms' % (before*1e3),
+                     '%.2f ms' % (after*1e3)])
+    print_table(['slices', 'duplicates', 'previous loop', 'sort'], rows)
+
+
+if __name__ == '__main__':
+    main()
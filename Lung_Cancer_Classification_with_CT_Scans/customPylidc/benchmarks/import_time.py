@@ -0,0 +1,71 @@
+"""
+Cold import time of `customPylidc`, measured with `python -X importtime`
+in fresh processes, with and without the plotting and 3D dependencies
+that it used to import eagerly (matplotlib, mpl_toolkits.mplot3d,
+skimage.measure, scipy and the upstream pylidc package).
+
+    python -m customPylidc.benchmarks.import_time [--repeat 5]
+"""
+import sys
+import argparse
+import subprocess
+
+import numpy as np
+
+from customPylidc.benchmarks._common import print_table
+
+# The modules `customPylidc` imported at the top of its modules before
+# they were deferred to the methods using them.
+eager_imports = ['matplotlib.pyplot', 'matplotlib.widgets',
+                 'mpl_toolkits.mplot3d', 'skimage.measure',
+                 'scipy.spatial', 'scipy.ndimage', 'scipy.interpolate',
+                 'pylidc']
+
+heavy_packages = ['matplotlib', 'mpl_toolkits', 'skimage', 'scipy',
+                  'pylidc']
+
+
+def import_time(statement):
+    """
+    Run `statement` in a new interpreter and return the cumulative
+    import time (in seconds) of all its top-level imports, and the
+    top-level packages it loaded.
+    """
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                          statement], capture_output=True, text=True,
+                         check=True).stderr
+    total, packages = 0, set()
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        packages.add(name.strip().split('.')[0])
+        # Top-level imports are not indented.
+        if not name.startswith('  '):
+            total += int(cumulative)
+    return total * 1e-6, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [('eager (previous)',
+              '; '.join('import %s' % m for m in eager_imports) +
+              '; import customPylidc'),
+             ('deferred (current)', 'import customPylidc')]
+    rows = []
+    for name, statement in cases:
+        runs = [import_time(statement) for _ in range(args.repeat)]
+        times = [t for t, _ in runs]
+        loaded = sorted(set(heavy_packages) & runs[0][1])
+        rows.append([name, '%.2f s' % np.median(times),
+                     '%.2f-%.2f s' % (min(times), max(times)),
+                     ', '.join(loaded) or '-'])
+    print_table(['import', 'median', 'range', 'heavy packages loaded'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Time and bytes read by `Scan.load_all_dicom_images` on a synthetic
+series (300 files of 512x512 int16 slices by default, 3 of them at
+duplicated positions), compared with reading every file in full as it
+used to.
+
+    python -m customPylidc.benchmarks.lazy_dicom_loading [--slices 297]
+
+The series is written to a temporary directory under the identifiers of
+the first scan of the database, and the DICOM catalog and the image
+cache are bypassed.
+"""
+import os
+import shutil
+import argparse
+import tempfile
+import importlib
+
+import numpy as np
+import pydicom
+
+import customPylidc as pl
+from customPylidc import dicom_catalog
+from customPylidc.benchmarks._common import timed, print_table, \
+                                            write_series, bytes_read
+
+scan_module = importlib.import_module('customPylidc.Scan')
+
+
+def eager_load(scan):
+    """The previous loader: every file is read in full."""
+    path = scan.get_path_to_dicom_files()
+    images = []
+    for fname in os.listdir(path):
+        if fname.endswith('.dcm') and not fname.startswith('.'):
+            image = pydicom.dcmread(os.path.join(path, fname))
+            if str(image.SeriesInstanceUID).strip() == \
+                                        scan.series_instance_uid and \
+               str(image.StudyInstanceUID).strip() == \
+                                        scan.study_instance_uid:
+                images.append(image)
+    images.sort(key=lambda x: (float(x.ImagePositionPatient[-1]),
+                               float(x.InstanceNumber)))
+    return images
+
+
+def measure(func, repeat):
+    """
+    Return the best (time, bytes read) of `func()` and the best time
+    to then stack all the pixel arrays.
+    """
+    runs = []
+    for _ in range(repeat):
+        r0 = bytes_read()
+        t_load, images = timed(func)
+        r1 = bytes_read()
+        t_pixels, _ = timed(lambda: np.stack([x.pixel_array
+                                              for x in images]))
+        runs.append((t_load, None if r0 is None else r1 - r0, t_pixels))
+    return min(runs, key=lambda r: r[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--slices', type=int, default=297)
+    parser.add_argument('--duplicates', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scan = pl.query(pl.Scan).order_by(pl.Scan.id).first()
+    root = tempfile.mkdtemp()
+    get_root = scan_module._get_dicom_file_path_from_config_file
+    catalog = dicom_catalog._catalog
+    try:
+        write_series(os.path.join(root, scan.patient_id,
+                                  scan.study_instance_uid,
+                                  scan.series_instance_uid),
+                     scan.study_instance_uid, scan.series_instance_uid,
+                     np.arange(args.slices) * 2.5,
+                     duplicates=args.duplicates)
+        scan_module._get_dicom_file_path_from_config_file = lambda: root
+        dicom_catalog._catalog = None
+
+        rows = []
+        for name, func in (
+                ('full read (previous)', lambda: eager_load(scan)),
+                ('deferred pixel data', lambda:
+                    scan.load_all_dicom_images(verbose=False))):
+            t_load, nbytes, t_pixels = measure(func, args.repeat)
+            rows.append([name, '%.2f s' % t_load,
+                         '-' if nbytes is None
+                             else '%.1f MB' % (nbytes / 2**20),
+                         '%.2f s' % t_pixels])
+    finally:
+        scan_module._get_dicom_file_path_from_config_file = get_root
+        dicom_catalog._catalog = catalog
+        shutil.rmtree(root)
+
+    print("%d files, warm page cache"
+          % (args.slices + args.duplicates))
+    print_table(['loader', 'load', 'bytes read', 'then stack pixels'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Time of the Jaccard distances between all the annotation pairs of a
+sample of scans: with the previous Python sets of voxel tuples, with
+`annotation_distance_metrics.jaccard` (boolean masks) per pair, and with
+`pairwise_overlap` for all the pairs of a scan at once.
+
+    python -m customPylidc.benchmarks.overlap_metrics [--scans 100]
+"""
+import argparse
+
+import numpy as np
+import matplotlib.path as mplpath
+
+import customPylidc as pl
+from customPylidc import annotation_distance_metrics as adm
+from customPylidc.benchmarks._common import timed, print_table, \
+                                            sample_patients
+
+
+def previous_as_set(ann):
+    """The previous `Annotation._as_set`."""
+    included = set()
+    excluded = set()
+    for contour in ann.contours:
+        contour_matrix = contour.to_matrix()[:,:2]
+        if (contour_matrix[0] != contour_matrix[-1]).all():
+            contour_matrix = np.append(contour_matrix,
+                                       contour_matrix[0].reshape(1,2),
+                                       axis=0)
+
+        path = mplpath.Path(contour_matrix, closed=True)
+        mn = contour_matrix.min(axis=0)
+        mx = contour_matrix.max(axis=0)
+        x,y = np.mgrid[mn[0]:mx[0]+1, mn[1]:mx[1]+1]
+        test_points = np.c_[x.flatten(), y.flatten()]
+        points_in_contour = test_points[path.contains_points(test_points)]
+        points_in_contour = np.c_[
+            points_in_contour,
+            np.ones(points_in_contour.shape[0])*contour.image_z_position
+        ]
+        points_in_contour = list(map(tuple, points_in_contour))
+
+        if contour.inclusion:
+            included.update(points_in_contour)
+        else:
+            excluded.update(points_in_contour)
+    return included.difference(excluded)
+
+
+def previous_jaccard(ann1, ann2):
+    """The previous `annotation_distance_metrics.jaccard`."""
+    A1 = previous_as_set(ann1)
+    A2 = previous_as_set(ann2)
+    I = len(A1.intersection(A2))
+    return 1.0 - I*1.0 / len(A1.union(A2))
+
+
+def all_pairs(metric, anns):
+    D = np.zeros((len(anns), len(anns)))
+    for i in range(len(anns)):
+        for j in range(i+1, len(anns)):
+            D[i,j] = D[j,i] = metric(anns[i], anns[j])
+    return D
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scans', type=int, default=100)
+    args = parser.parse_args()
+
+    scans = pl.load_scans(sample_patients(args.scans))
+    groups = [list(scan.annotations) for scan in scans
+              if len(scan.annotations) > 1]
+
+    names = ['sets of voxel tuples (previous)', 'jaccard per pair',
+             'pairwise_overlap']
+    funcs = [lambda anns: all_pairs(previous_jaccard, anns),
+             lambda anns: all_pairs(adm.jaccard, anns),
+             adm.pairwise_overlap]
+    totals = [0.0] * len(funcs)
+    npairs = 0
+    for anns in groups:
+        results = []
+        for n, func in enumerate(funcs):
+            t, D = timed(func, anns)
+            totals[n] += t
+            results.append(D)
+        for D in results[1:]:
+            np.testing.assert_allclose(D, results[0], rtol=0, atol=1e-12)
+        npairs += len(anns) * (len(anns) - 1) // 2
+
+    print("%d scans, %d annotation pairs (distances checked equal)"
+          % (len(groups), npairs))
+    print_table(['method', 'total time'],
+                [[name, '%.2f s' % t] for name, t in zip(names, totals)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Accuracy and time of the surface area estimators over a random sample
+of annotations: the previous marching cubes mesh of the float64 mask
+(the reference), the marching cubes case table summed over the boolean
+mask used by `Annotation.surface_area`, and the contour-based
+`Annotation.lofted_surface_area`.
+
+    python -m customPylidc.benchmarks.surface_area [--annotations 1000]
+
+The masks are computed before timing the mask-based estimators.
+"""
+import argparse
+
+import numpy as np
+
+import customPylidc as pl
+from customPylidc.geometry import get_marching_cubes, mask_surface_area
+from customPylidc.benchmarks._common import timed, print_table
+
+
+def previous_surface_area(mask, spacing):
+    """The previous `Annotation.surface_area`, given the mask."""
+    from skimage.measure import mesh_surface_area
+
+    mask = np.pad(mask, [(1,1), (1,1), (1,1)], 'constant')
+    mask = mask.astype(float)
+    verts, faces, _, _ = get_marching_cubes()(mask, 0.5, spacing=spacing)
+    return mesh_surface_area(verts, faces)
+
+
+lofted_surface_area = pl.Annotation.lofted_surface_area.fget.__wrapped__
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--annotations', type=int, default=1000)
+    args = parser.parse_args()
+
+    ids = [i for i, in pl.query(pl.Annotation.id)]
+    rng = np.random.default_rng(0)
+    ids = rng.choice(ids, min(args.annotations, len(ids)), replace=False)
+    anns = pl.query(pl.Annotation)\
+             .filter(pl.Annotation.id.in_(ids.tolist())).all()
+
+    values = np.full((3, len(anns)), np.nan)
+    times = np.zeros(3)
+    for n, ann in enumerate(anns):
+        mask = ann.boolean_mask()
+        rij, rk = ann.scan.pixel_spacing, ann.scan.slice_thickness
+        spacing = (rij, rij, rk)
+        try:
+            t, values[0,n] = timed(previous_surface_area, mask, spacing)
+            times[0] += t
+        except (ValueError, RuntimeError):
+            # marching_cubes fails on some degenerate masks.
+            pass
+        t, values[1,n] = timed(mask_surface_area, mask, spacing)
+        times[1] += t
+        t, values[2,n] = timed(lofted_surface_area, ann)
+        times[2] += t
+
+    ok = ~np.isnan(values[0])
+    rel = (values[:,ok] - values[0,ok]) / values[0,ok]
+    rows = []
+    for name, r, t in zip(['marching cubes mesh (previous)',
+                           'case table (surface_area)',
+                           'lofted contours (lofted_surface_area)'],
+                          rel, times):
+        rows.append([name, '%.2f ms' % (t / len(anns) * 1e3),
+                     '%.2g' % np.median(np.abs(r)),
+                     '%.2g' % np.percentile(np.abs(r), 90)])
+
+    print("%d annotations (marching cubes failed on %d of them)"
+          % (len(anns), (~ok).sum()))
+    print_table(['estimator', 'mean time', 'median |rel. diff|',
+                 'p90 |rel. diff|'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency of reading the region around each annotation (its bounding box
+padded by 10 voxels) of a few scans: from the DICOM files found by a
+directory scan, from the DICOM catalog with memory-mapped pixel data,
+and from the chunked volume store. Also reports the compression ratio
+of the store.
+
+    python -m customPylidc.benchmarks.volume_store [patient ids]
+
+The patients (LIDC-IDRI-0078, LIDC-IDRI-0069 and LIDC-IDRI-0048 by
+default) are ingested into a temporary volume store, which is used in
+place of the default one and removed at the end.
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+import customPylidc as pl
+from customPylidc import dicom_catalog, volume_store
+from customPylidc.benchmarks._common import median_time, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('patient_ids', nargs='*',
+                        default=['LIDC-IDRI-0078', 'LIDC-IDRI-0069',
+                                 'LIDC-IDRI-0048'])
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        store = volume_store.ingest(args.patient_ids, path=root,
+                                    verbose=False)
+        volume_store._store = store
+        scans = pl.load_scans(args.patient_ids)
+        rois = [(scan, ann.bbox(pad=10)) for scan in scans
+                for ann in scan.annotations]
+
+        raw = stored = 0
+        for scan in scans:
+            uid = scan.series_instance_uid
+            if uid in store:
+                raw += np.prod(store.metadata(uid)['shape']) * 2
+                stored += os.path.getsize(store._file(uid))
+
+        def from_dicom(item):
+            scan, bb = item
+            return scan.to_volume(verbose=False, cache=False,
+                                  k_range=bb[2], ij_window=bb[:2])
+
+        def from_store(item):
+            scan, bb = item
+            return scan.to_volume(verbose=False, k_range=bb[2],
+                                  ij_window=bb[:2])
+
+        for item in rois[:3]:
+            assert np.array_equal(from_dicom(item), from_store(item))
+
+        catalog = dicom_catalog.get_dicom_catalog()
+        rows = []
+        try:
+            dicom_catalog._catalog = None
+            rows.append(['DICOM, directory scan',
+                         median_time(from_dicom, rois)])
+            if catalog is not None:
+                dicom_catalog._catalog = catalog
+                rows.append(['DICOM, catalog + mmap',
+                             median_time(from_dicom, rois)])
+        finally:
+            dicom_catalog._catalog = False
+        rows.append(['volume store', median_time(from_store, rois)])
+
+        ratio = '%.1f' % (raw / stored) if stored > 0 else '-'
+        print("%d scans, %d annotations; store compression ratio %s "
+              "(%.1f MB -> %.1f MB)" % (len(scans), len(rois), ratio,
+                                        raw / 2**20, stored / 2**20))
+        print_table(['source', 'median ROI read'],
+                    [[name, '%.1f ms' % (t*1e3)] for name, t in rows])
+    finally:
+        volume_store._store = False
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Columnar (Parquet/Arrow) export of the pylidc annotation database.
+
+Dataset-wide statistics (patients, scans per patient, feature
+distributions, ...) don't need the ORM objects at all. `export_parquet`
+writes the `scans`, `annotations` and `zvals` tables once as typed
+Parquet files, and `load_parquet` reads them back as pandas DataFrames
+(or Arrow tables) ready for vectorized groupby analysis.
+
+This module requires `pyarrow` (and `pandas`).
+
+Example
+-------
+An example::
+
+    from pylidc.columnar import export_parquet, load_parquet
+
+    export_parquet()
+    tables = load_parquet()
+
+    scans = tables['scans']
+    print(scans.patient_id.nunique(), scans.shape[0])
+    # => 1010 1018
+
+    anns = tables['annotations']
+    print(anns.groupby('scan_id').size().describe())
+
+    # Slice spacing of every scan.
+    zvals = tables['zvals'].sort_values(['scan_id', 'val'])
+    spacing = zvals.groupby('scan_id').val.apply(lambda z: z.diff().median())
+"""
+import os
+
+from .Annotation import feature_names
+
+table_names = ('scans', 'annotations', 'zvals')
+
+_queries = {
+    'scans':
+        "SELECT id, patient_id, study_instance_uid, series_instance_uid, "
+        "slice_thickness, pixel_spacing, contrast_used, is_from_initial "
+        "FROM scans ORDER BY id",
+    'annotations':
+        "SELECT a.id, a.scan_id, s.patient_id, s.series_instance_uid, "
+        "a._nodule_id, " + ", ".join('a."%s"' % f for f in feature_names) +
+        " FROM annotations a JOIN scans s ON s.id = a.scan_id "
+        "ORDER BY a.id",
+    'zvals':
+        "SELECT id, scan_id, val FROM zvals ORDER BY id",
+}
+
+
+def _schemas():
+    import pyarrow as pa
+    return {
+        'scans': pa.schema([
+            ('id', pa.int32()),
+            ('patient_id', pa.string()),
+            ('study_instance_uid', pa.string()),
+            ('series_instance_uid', pa.string()),
+            ('slice_thickness', pa.float64()),
+            ('pixel_spacing', pa.float64()),
+            ('contrast_used', pa.bool_()),
+            ('is_from_initial', pa.bool_()),
+        ]),
+        'annotations': pa.schema([
+            ('id', pa.int32()),
+            ('scan_id', pa.int32()),
+            ('patient_id', pa.string()),
+            ('series_instance_uid', pa.string()),
+            ('_nodule_id', pa.string()),
+        ] + [(f, pa.int8()) for f in feature_names]),
+        'zvals': pa.schema([
+            ('id', pa.int32()),
+            ('scan_id', pa.int32()),
+            ('val', pa.float64()),
+        ]),
+    }
+
+
+def _get_parquet_path():
+    from .Scan import _get_cache_path
+    return os.path.join(_get_cache_path(), 'parquet')
+
+
+def export_parquet(directory=None, compression='zstd'):
+    """
+    Write the `scans`, `annotations` (the 9 semantic features plus the
+    scan keys) and `zvals` tables of the database as Parquet files.
+
+    Parameters
+    ----------
+    directory: string, default=None
+        The output directory. Defaults to `parquet` in the pylidc cache
+        directory (`~/.pylidc_cache`, or the `PYLIDC_CACHE` environment
+        variable).
+
+    compression: string, default='zstd'
+        The Parquet compression codec.
+
+    Return
+    ------
+    paths: dict
+        `paths[name]` is the path of the file written for table `name`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from . import get_engine
+
+    directory = _get_parquet_path() if directory is None else directory
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    schemas = _schemas()
+    paths = {}
+    with get_engine().connect() as conn:
+        for name in table_names:
+            cursor = conn.exec_driver_sql(_queries[name])
+            rows = cursor.fetchall()
+            columns = list(zip(*rows)) if len(rows) else \
+                      [[] for _ in schemas[name]]
+            table = pa.Table.from_arrays(
+                [pa.array(col).cast(field.type)
+                    for col, field in zip(columns, schemas[name])],
+                schema=schemas[name])
+            paths[name] = os.path.join(directory, name + '.parquet')
+            pq.write_table(table, paths[name], compression=compression)
+    return paths
+
+
+def load_parquet(directory=None, tables=table_names, as_arrow=False):
+    """
+    Load tables written by `export_parquet`.
+
+    Parameters
+    ----------
+    directory: string, default=None
+        See `export_parquet`.
+
+    tables: iterable of strings, default=('scans', 'annotations', 'zvals')
+        The tables to load.
+
+    as_arrow: bool, default=False
+        If True, return `pyarrow.Table` objects instead of pandas
+        DataFrames.
+
+    Return
+    ------
+    tables: dict
+        `tables[name]` is the DataFrame (or Arrow table) of table `name`.
+    """
+    import pyarrow.parquet as pq
+
+    directory = _get_parquet_path() if directory is None else directory
+
+    loaded = {}
+    for name in tables:
+        if name not in table_names:
+            raise ValueError("Unknown table `%s`. Available tables are %s."
+                             % (name, table_names))
+        table = pq.read_table(os.path.join(directory, name + '.parquet'))
+        loaded[name] = table if as_arrow else table.to_pandas()
+    return loaded
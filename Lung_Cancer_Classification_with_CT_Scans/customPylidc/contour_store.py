@@ -0,0 +1,277 @@
+"""
+A packed, memory-mapped store of the contour coordinates in the
+pylidc database.
+
+The `coords` column of the `contours` table holds the boundary points
+of each contour as text, which `Contour.to_matrix` would otherwise need
+to parse on every call. `build_contour_store` converts all the contours
+once into a CSR-style layout of `.npy` files:
+
+    coords.npy              int16, shape=(npoints, 2)
+        The (i,j) index coordinates of all the contours, concatenated.
+    contour_ids.npy         int32, shape=(ncontours,)
+        The `Contour.id` of each contour row.
+    contour_offsets.npy     int32, shape=(ncontours+1,)
+        The rows of contour `c` are `coords[offsets[c]:offsets[c+1]]`.
+    contour_z.npy           float64, shape=(ncontours,)
+        The `Contour.image_z_position` of each contour row.
+    contour_inclusion.npy   bool, shape=(ncontours,)
+        The `Contour.inclusion` flag of each contour row.
+    annotation_ids.npy      int32, shape=(nannotations,)
+        The `Annotation.id` of each annotation.
+    annotation_offsets.npy  int32, shape=(nannotations+1,)
+        The contour rows of annotation `a` are
+        `offsets[a]:offsets[a+1]`.
+
+Contour rows are grouped by annotation and sorted by `image_z_position`
+(then `id`) within each annotation, so the boundary points of a whole
+annotation are a single contiguous block of `coords`.
+
+When the store is present, it is opened with `mmap_mode='r'` and
+`Contour.to_matrix` and `Annotation.contours_matrix` read from it
+instead of parsing strings (returning new arrays), while the geometry
+computations of `Annotation` use views into it.
+
+Example
+-------
+The store only needs to be built once::
+
+    from pylidc.contour_store import build_contour_store
+
+    build_contour_store()
+"""
+import os
+import json
+import warnings
+
+import numpy as np
+import sqlalchemy as sq
+
+_store_version = 1
+
+_array_names = ['coords', 'contour_ids', 'contour_offsets', 'contour_z',
+                'contour_inclusion', 'annotation_ids', 'annotation_offsets']
+
+# The store opened by `get_contour_store`. `False` means "not looked up yet".
+_store = False
+
+
+def _get_store_path():
+    from .Scan import _get_cache_path
+    return os.path.join(_get_cache_path(), 'contours')
+
+
+def _contour_table_signature(engine):
+    """
+    A cheap fingerprint of the `contours` table, used to detect a store
+    built from a different database.
+    """
+    with engine.connect() as conn:
+        count, max_id = conn.execute(
+            sq.text("SELECT COUNT(*), MAX(id) FROM contours")).one()
+    return [int(count), int(max_id or 0)]
+
+
+class ContourStore(object):
+    """
+    Read-only access to a packed contour store directory. See the
+    module documentation for the layout.
+
+    Parameters
+    ----------
+    path: string
+        The store directory.
+
+    mmap_mode: string or None, default='r'
+        Passed to `numpy.load`.
+    """
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        for name in _array_names:
+            setattr(self, name, np.load(os.path.join(path, name+'.npy'),
+                                        mmap_mode=mmap_mode))
+
+        # Lookup tables from database ids to store rows.
+        self._contour_order = np.argsort(self.contour_ids, kind='stable')
+        self._contour_sorted_ids = np.asarray(self.contour_ids)[
+                                                    self._contour_order]
+
+    def __repr__(self):
+        return "ContourStore(path=%s,ncontours=%d)" % (
+                    self.path, self.contour_ids.shape[0])
+
+    def contour_row(self, contour_id):
+        """
+        Return the row of the contour with the given `Contour.id`,
+        or -1 if it is not in the store.
+        """
+        i = np.searchsorted(self._contour_sorted_ids, contour_id)
+        if i == self._contour_sorted_ids.shape[0] or \
+           self._contour_sorted_ids[i] != contour_id:
+            return -1
+        return self._contour_order[i]
+
+    def annotation_row(self, annotation_id):
+        """
+        Return the row of the annotation with the given `Annotation.id`,
+        or -1 if it is not in the store.
+        """
+        i = np.searchsorted(self.annotation_ids, annotation_id)
+        if i == self.annotation_ids.shape[0] or \
+           self.annotation_ids[i] != annotation_id:
+            return -1
+        return i
+
+    def contour_coords(self, contour_id):
+        """
+        Return a read-only (i,j) view of the coordinates of a contour,
+        or None if the contour is not in the store.
+        """
+        c = self.contour_row(contour_id)
+        if c < 0:
+            return None
+        return self.coords[self.contour_offsets[c]:self.contour_offsets[c+1]]
+
+    def annotation_coords(self, annotation_id):
+        """
+        Return the coordinates of all the contours of an annotation
+        (sorted by z) as a 3-tuple `(ij, z, counts)` where `ij` is a
+        read-only view into the store, `z` holds the `image_z_position`
+        of each contour, and `counts` the number of points of each
+        contour. None is returned if the annotation is not in the store.
+        """
+        a = self.annotation_row(annotation_id)
+        if a < 0:
+            return None
+        c0, c1 = self.annotation_offsets[a], self.annotation_offsets[a+1]
+        offsets = self.contour_offsets[c0:c1+1]
+        ij = self.coords[offsets[0]:offsets[-1]]
+        return ij, self.contour_z[c0:c1], np.diff(offsets)
+
+    def annotation_inclusion(self, annotation_id):
+        """
+        Return the `Contour.inclusion` flags of the contours of an
+        annotation, in the order of `annotation_coords`, or None if the
+        annotation is not in the store.
+        """
+        a = self.annotation_row(annotation_id)
+        if a < 0:
+            return None
+        c0, c1 = self.annotation_offsets[a], self.annotation_offsets[a+1]
+        return self.contour_inclusion[c0:c1]
+
+
+def build_contour_store(path=None, verbose=True):
+    """
+    Convert all the contours in the pylidc database into a packed
+    contour store (see the module documentation).
+
+    Parameters
+    ----------
+    path: string, default=None
+        The directory to write the store into. Defaults to
+        `contours` in the pylidc cache directory (`~/.pylidc_cache`, or
+        the `PYLIDC_CACHE` environment variable).
+
+    verbose: bool, default=True
+        Turn the progress statements on/off.
+
+    Return
+    ------
+    store: :class:`ContourStore`
+        The newly built store.
+    """
+    global _store
+    from . import get_engine
+
+    path = _get_store_path() if path is None else path
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    if verbose: print("Reading contours from the database ...")
+    with get_engine().connect() as conn:
+        rows = conn.execute(sq.text(
+            "SELECT id, annotation_id, inclusion, image_z_position, coords "
+            "FROM contours "
+            "ORDER BY annotation_id, image_z_position, id")).all()
+
+    if verbose: print("Packing %d contours ..." % len(rows))
+    contour_ids    = np.array([r[0] for r in rows], dtype=np.int32)
+    contour_ann    = np.array([r[1] for r in rows], dtype=np.int32)
+    contour_incl   = np.array([bool(r[2]) for r in rows], dtype=bool)
+    contour_z      = np.array([r[3] for r in rows], dtype=np.float64)
+    contour_coords = [r[4].strip() for r in rows]
+
+    counts = np.array([c.count('\n')+1 for c in contour_coords],
+                      dtype=np.int32)
+    contour_offsets = np.zeros(len(rows)+1, dtype=np.int32)
+    np.cumsum(counts, out=contour_offsets[1:])
+
+    # One parse for all the points. The reversal is because the
+    # coordinates from the LIDC XML are stored as (x,y), not (i,j).
+    xy = np.array(','.join(contour_coords).replace('\n', ',').split(','),
+                  dtype=np.int16).reshape(-1, 2)
+    coords = np.ascontiguousarray(xy[:,::-1])
+    assert coords.shape[0] == contour_offsets[-1], "Malformed contours."
+
+    annotation_ids, annotation_starts = np.unique(contour_ann,
+                                                  return_index=True)
+    annotation_offsets = np.r_[annotation_starts,
+                               len(rows)].astype(np.int32)
+
+    arrays = dict(coords=coords,
+                  contour_ids=contour_ids,
+                  contour_offsets=contour_offsets,
+                  contour_z=contour_z,
+                  contour_inclusion=contour_incl,
+                  annotation_ids=annotation_ids.astype(np.int32),
+                  annotation_offsets=annotation_offsets)
+    for name in _array_names:
+        np.save(os.path.join(path, name+'.npy'), arrays[name])
+
+    meta = dict(version=_store_version,
+                signature=_contour_table_signature(get_engine()))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    if verbose: print("Contour store written to %s." % path)
+
+    # Drop any previously opened store.
+    _store = False
+    return ContourStore(path)
+
+
+def load_contour_store(path=None):
+    """
+    Open a packed contour store, or return None if it does not exist
+    or was built from a different database.
+    """
+    from . import get_engine
+
+    path = _get_store_path() if path is None else path
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+
+    with open(meta_file) as f:
+        meta = json.load(f)
+
+    if meta.get('version') != _store_version or \
+       meta.get('signature') != _contour_table_signature(get_engine()):
+        msg = ("The contour store in {} is out of date and will be "
+               "ignored. Run `build_contour_store` to rebuild it.")
+        warnings.warn(msg.format(path))
+        return None
+
+    return ContourStore(path)
+
+
+def get_contour_store():
+    """
+    Return the default contour store (opened once per process),
+    or None if it has not been built.
+    """
+    global _store
+    if _store is False:
+        _store = load_contour_store()
+    return _store
@@ -0,0 +1,139 @@
+"""
+Optimized local copy of the pylidc database.
+
+The sqlite file packaged with pylidc has no indexes besides the primary
+keys, so every `Scan.patient_id` filter and every lazy load of
+`scan.annotations`, `annotation.contours` or `scan.zvals` is a full
+table scan. `build_optimized_database` makes a local copy of it with:
+
+* indexes on the foreign keys and filter columns (covering the columns
+  read by the relationship loads where that is cheap),
+* statistics for the query planner (`ANALYZE`),
+* a compacted file (`VACUUM`) with the requested `page_size`.
+
+Once built, `pylidc` uses the copy transparently (unless another
+database is set with `pylidc.configure`), and opens it with a
+memory-mapped I/O window (`PRAGMA mmap_size`).
+
+Example
+-------
+The copy only needs to be built once::
+
+    from pylidc.database import build_optimized_database
+
+    build_optimized_database()
+"""
+import os
+import sqlite3
+from urllib.parse import quote
+
+_indexes = [
+    ('ix_scans_patient_id',       'scans',       ('patient_id', 'id')),
+    ('ix_scans_series_uid',       'scans',       ('series_instance_uid',)),
+    ('ix_annotations_scan_id',    'annotations', ('scan_id', 'id')),
+    ('ix_contours_annotation_id', 'contours',    ('annotation_id', 'id')),
+    ('ix_zvals_scan_id',          'zvals',       ('scan_id', 'id', 'val')),
+]
+
+# Size of the memory-mapped I/O window used for the optimized copy.
+default_mmap_size = 256 * 1024**2
+
+
+def optimized_database_path():
+    """
+    Return the path of the optimized copy of the database, which is
+    `pylidc.sqlite` in the pylidc cache directory (`~/.pylidc_cache`,
+    or the `PYLIDC_CACHE` environment variable).
+    """
+    from .Scan import _get_cache_path
+    return os.path.join(_get_cache_path(), 'pylidc.sqlite')
+
+
+def get_optimized_database(source):
+    """
+    Return the path of the optimized copy if it exists and is not
+    older than the `source` database, otherwise None.
+    """
+    path = optimized_database_path()
+    if os.path.exists(path) and \
+       os.path.getmtime(path) >= os.path.getmtime(source):
+        return path
+    return None
+
+
+def create_indexes(connection):
+    """
+    Create (if missing) the indexes used by pylidc queries on an open
+    `sqlite3` connection.
+    """
+    for name, table, columns in _indexes:
+        connection.execute('CREATE INDEX IF NOT EXISTS %s ON %s (%s)'
+                           % (name, table, ', '.join(columns)))
+    connection.commit()
+
+
+def build_optimized_database(dest=None, source=None, page_size=4096,
+                             verbose=True):
+    """
+    Make an indexed, analyzed and vacuumed local copy of the pylidc
+    database.
+
+    Parameters
+    ----------
+    dest: string, default=None
+        Path of the copy. Defaults to `optimized_database_path()`, which
+        is picked up automatically by pylidc.
+
+    source: string, default=None
+        The database to copy. Defaults to the one packaged with pylidc.
+
+    page_size: int, default=4096
+        The SQLite page size of the copy (a power of two between 512
+        and 65536).
+
+    verbose: bool, default=True
+        Turn the progress statements on/off.
+
+    Return
+    ------
+    dest: string
+        The path of the copy.
+    """
+    from . import _dbpath, _reset_engine
+
+    source = _dbpath if source is None else source
+    dest = optimized_database_path() if dest is None else dest
+
+    directory = os.path.dirname(os.path.abspath(dest))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    tmp = dest + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    if verbose: print("Copying %s ..." % source)
+    src = sqlite3.connect('file:%s?mode=ro' % quote(os.path.abspath(source)),
+                          uri=True)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst)
+        src.close()
+
+        if verbose: print("Creating indexes ...")
+        create_indexes(dst)
+
+        if verbose: print("Analyzing and vacuuming ...")
+        dst.execute('PRAGMA page_size = %d' % int(page_size))
+        dst.execute('ANALYZE')
+        dst.commit()
+        dst.execute('VACUUM')
+    finally:
+        dst.close()
+
+    os.replace(tmp, dest)
+    if verbose: print("Optimized database written to %s." % dest)
+
+    # Make pylidc pick up the new file.
+    _reset_engine()
+    return dest
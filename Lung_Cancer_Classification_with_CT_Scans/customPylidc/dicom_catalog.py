@@ -0,0 +1,305 @@
+"""
+A persistent catalog of the DICOM slices of the LIDC-IDRI download.
+
+Locating the DICOM files of a scan in the TCIA folder layout requires
+walking the patient directory and reading DICOM files, and loading the
+images requires reading every file of the directory just to filter
+them by UID and z-position. `build_dicom_catalog` does this once for the
+whole download and stores one record per slice in a local SQLite file:
+
+    path, study_instance_uid, series_instance_uid, z (the last
+    ImagePositionPatient coordinate), instance_number, rescale_slope,
+    rescale_intercept, rows, cols, and the location of the pixel data
+    in the file (pixel_offset, pixel_dtype, bits_stored; NULL for
+    compressed slices, see `pylidc.dicom_pixels`)
+
+When the catalog exists, `Scan.get_path_to_dicom_files` and
+`Scan.load_all_dicom_images` look the series up in it, so that the path
+lookup, the UID filtering, the duplicate-z pruning and the z-sorting
+happen without opening any DICOM file, and `Scan.to_volume`
+memory-maps the pixel data of uncompressed slices without parsing their
+headers.
+
+Example
+-------
+The catalog only needs to be (re)built when the DICOM files change::
+
+    from pylidc.dicom_catalog import build_dicom_catalog
+
+    build_dicom_catalog()
+"""
+import os
+import sqlite3
+import warnings
+import contextlib
+from urllib.parse import quote
+from collections import namedtuple
+
+import pydicom as dicom
+
+from .dicom_pixels import pixel_layout
+
+_catalog_version = 2
+
+SliceRecord = namedtuple('SliceRecord',
+                         ['path', 'study_instance_uid', 'series_instance_uid',
+                          'z', 'instance_number', 'rescale_slope',
+                          'rescale_intercept', 'rows', 'cols',
+                          'pixel_offset', 'pixel_dtype', 'bits_stored'])
+
+_header_tags = ['StudyInstanceUID', 'SeriesInstanceUID',
+                'ImagePositionPatient', 'InstanceNumber',
+                'RescaleSlope', 'RescaleIntercept', 'Rows', 'Columns',
+                'BitsAllocated', 'BitsStored', 'PixelRepresentation',
+                'SamplesPerPixel', 'PhotometricInterpretation',
+                'NumberOfFrames']
+
+_schema = """
+CREATE TABLE slices (
+    id                  INTEGER PRIMARY KEY,
+    path                TEXT NOT NULL,
+    study_instance_uid  TEXT,
+    series_instance_uid TEXT,
+    z                   REAL,
+    instance_number     REAL,
+    rescale_slope       REAL,
+    rescale_intercept   REAL,
+    rows                INTEGER,
+    cols                INTEGER,
+    pixel_offset        INTEGER,
+    pixel_dtype         TEXT,
+    bits_stored         INTEGER
+);
+CREATE TABLE info (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_index = ("CREATE INDEX ix_slices_series ON slices "
+          "(series_instance_uid, study_instance_uid, z, instance_number)")
+
+# The catalog opened by `get_dicom_catalog`. `False` means "not looked up".
+_catalog = False
+
+
+def catalog_path():
+    """
+    Return the default catalog location, `dicom_catalog.sqlite` in the
+    pylidc cache directory (`~/.pylidc_cache`, or the `PYLIDC_CACHE`
+    environment variable).
+    """
+    from .Scan import _get_cache_path
+    return os.path.join(_get_cache_path(), 'dicom_catalog.sqlite')
+
+
+def _read_header(path):
+    """
+    Read the catalog record of a DICOM file without its pixel data.
+    """
+    image = dicom.dcmread(path, stop_before_pixels=True,
+                          specific_tags=_header_tags)
+
+    def get(name, cast):
+        value = image.get(name, None)
+        return None if value is None or value == '' else cast(value)
+
+    position = image.get('ImagePositionPatient', None)
+    layout = pixel_layout(image)
+    return SliceRecord(
+        path=path,
+        study_instance_uid=str(image.StudyInstanceUID).strip(),
+        series_instance_uid=str(image.SeriesInstanceUID).strip(),
+        z=None if not position else float(position[-1]),
+        instance_number=get('InstanceNumber', float),
+        rescale_slope=get('RescaleSlope', float),
+        rescale_intercept=get('RescaleIntercept', float),
+        rows=get('Rows', int),
+        cols=get('Columns', int),
+        pixel_offset=None if layout is None else layout.offset,
+        pixel_dtype=None if layout is None else layout.dtype,
+        bits_stored=None if layout is None else layout.bits_stored)
+
+
+class DicomCatalog(object):
+    """
+    Read access to a DICOM catalog file built by `build_dicom_catalog`.
+
+    Parameters
+    ----------
+    path: string
+        Path of the catalog SQLite file.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return "DicomCatalog(path=%s)" % self.path
+
+    def _connect(self):
+        # A short-lived connection per call keeps the catalog usable from
+        # any thread and from forked processes. Callers wrap it in
+        # `contextlib.closing`; a bare `with conn:` only ends the
+        # transaction and leaves the connection open.
+        return sqlite3.connect('file:%s?mode=ro'
+                               % quote(os.path.abspath(self.path)), uri=True)
+
+    def _info(self, key):
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM info WHERE key = ?",
+                               (key,)).fetchone()
+        return None if row is None else row[0]
+
+    @property
+    def root(self):
+        """The DICOM root directory the catalog was built from."""
+        return self._info('root')
+
+    @property
+    def version(self):
+        """The format version of the catalog."""
+        version = self._info('version')
+        return 1 if version is None else int(version)
+
+    def series_records(self, study_instance_uid, series_instance_uid,
+                       dedupe=True):
+        """
+        Return the slice records of a series sorted by increasing z.
+
+        Parameters
+        ----------
+        study_instance_uid, series_instance_uid: string
+            The UIDs of the series (see `Scan`).
+
+        dedupe: bool, default=True
+            If True, only the slice with the lowest InstanceNumber is
+            kept for each z-position (the choice made by
+            `Scan.load_all_dicom_images`).
+
+        Return
+        ------
+        records: list of `SliceRecord`
+        """
+        with contextlib.closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT path, study_instance_uid, series_instance_uid, z, "
+                "instance_number, rescale_slope, rescale_intercept, rows, "
+                "cols, pixel_offset, pixel_dtype, bits_stored FROM slices "
+                "WHERE series_instance_uid = ? AND study_instance_uid = ? "
+                "ORDER BY z, instance_number, id",
+                (series_instance_uid, study_instance_uid)).fetchall()
+
+        records = [SliceRecord(*row) for row in rows]
+        if dedupe:
+            records = [r for i,r in enumerate(records)
+                       if i == 0 or r.z != records[i-1].z]
+        return records
+
+    def series_directory(self, study_instance_uid, series_instance_uid):
+        """
+        Return the directory holding the files of a series, or None
+        if the series is not in the catalog.
+        """
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT path FROM slices "
+                "WHERE series_instance_uid = ? AND study_instance_uid = ? "
+                "LIMIT 1",
+                (series_instance_uid, study_instance_uid)).fetchone()
+        return None if row is None else os.path.dirname(row[0])
+
+
+def build_dicom_catalog(root=None, path=None, verbose=True):
+    """
+    Read the header of every DICOM file below `root` (pixel data is not
+    read) and store one record per slice in a catalog file.
+
+    Parameters
+    ----------
+    root: string, default=None
+        The DICOM root directory. Defaults to the `path` option of the
+        `dicom` section of the pylidc configuration file.
+
+    path: string, default=None
+        The catalog file to write. Defaults to `catalog_path()`.
+
+    verbose: bool, default=True
+        Turn the progress statements on/off.
+
+    Return
+    ------
+    catalog: :class:`DicomCatalog`
+    """
+    global _catalog
+    from .Scan import _get_dicom_file_path_from_config_file
+
+    root = _get_dicom_file_path_from_config_file() if root is None else root
+    path = catalog_path() if path is None else path
+
+    if not os.path.isdir(root):
+        raise RuntimeError("DICOM root directory %s does not exist." % root)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(_schema)
+        conn.execute("INSERT INTO info VALUES ('root', ?)",
+                     (os.path.abspath(root),))
+        conn.execute("INSERT INTO info VALUES ('version', ?)",
+                     (str(_catalog_version),))
+
+        nfiles = 0
+        for dpath, dnames, fnames in os.walk(root):
+            dnames.sort()
+            records = []
+            for fname in sorted(fnames):
+                if not fname.endswith('.dcm') or fname.startswith('.'):
+                    continue
+                fpath = os.path.abspath(os.path.join(dpath, fname))
+                try:
+                    records.append(_read_header(fpath))
+                except Exception as e:
+                    if verbose: print("Skipping %s: %s" % (fpath, e))
+            conn.executemany("INSERT INTO slices (path, study_instance_uid, "
+                             "series_instance_uid, z, instance_number, "
+                             "rescale_slope, rescale_intercept, rows, cols, "
+                             "pixel_offset, pixel_dtype, bits_stored) "
+                             "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", records)
+            nfiles += len(records)
+            if verbose and len(records) > 0:
+                print("Cataloged %d files (%s)" % (nfiles, dpath))
+
+        conn.execute(_index)
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, path)
+
+    # Drop any previously opened catalog.
+    _catalog = False
+    return DicomCatalog(path)
+
+
+def get_dicom_catalog():
+    """
+    Return the default DICOM catalog (looked up once per process), or
+    None if it has not been built.
+    """
+    global _catalog
+    if _catalog is False:
+        path = catalog_path()
+        _catalog = DicomCatalog(path) if os.path.exists(path) else None
+        if _catalog is not None and _catalog.version != _catalog_version:
+            msg = ("The DICOM catalog {} is out of date and will be "
+                   "ignored. Run `build_dicom_catalog` to rebuild it.")
+            warnings.warn(msg.format(path))
+            _catalog = None
+    return _catalog
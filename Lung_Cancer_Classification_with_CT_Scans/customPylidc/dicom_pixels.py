@@ -0,0 +1,169 @@
+"""
+Memory-mapped access to the pixel data of uncompressed DICOM slices.
+
+The LIDC-IDRI CT slices are mostly stored uncompressed, so their pixel
+data is a plain little-endian array at the end of the file. Instead of
+reading and copying the whole `PixelData` element with pydicom,
+`slice_pixels` exposes it as a read-only `np.memmap` view of the file,
+so that cropping a slice only touches the pages of the crop and
+assembling a volume copies every pixel once.
+
+The location of the pixel data (`pixel_layout`) is resolved from the
+header of a slice, and is stored in the DICOM catalog (see
+`pylidc.dicom_catalog`) so that cataloged slices can be mapped without
+parsing their header again. Compressed slices, and anything else the
+fast path does not handle, are decoded with pydicom as usual.
+"""
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+import pydicom as dicom
+
+PixelLayout = namedtuple('PixelLayout', ['offset', 'dtype', 'rows', 'cols',
+                                         'bits_stored'])
+
+_implicit_little = '1.2.840.10008.1.2'
+_explicit_little = '1.2.840.10008.1.2.1'
+
+# From version 3, pydicom clears the unused high bits of the pixel values
+# (or sign-extends them), which then has to be done here as well.
+_corrects_unused_bits = int(dicom.__version__.split('.')[0]) >= 3
+
+
+def _is_pixel_data_element(f, offset, length, implicit):
+    """
+    Check that the element ending at `offset` in file `f` is a top-level
+    `PixelData` element of the given value length.
+    """
+    size = 8 if implicit else 12
+    if offset < size:
+        return False
+    f.seek(offset - size)
+    header = f.read(size)
+    if implicit:
+        group, elem, vlen = struct.unpack('<HHI', header)
+        return (group, elem, vlen) == (0x7FE0, 0x0010, length)
+    group, elem, vr, _, vlen = struct.unpack('<HH2s2sI', header)
+    return (group, elem) == (0x7FE0, 0x0010) and vr in (b'OW', b'OB') \
+           and vlen == length
+
+
+def pixel_layout(dataset):
+    """
+    Locate the pixel data of a DICOM slice read from a file.
+
+    Parameters
+    ----------
+    dataset: pydicom Dataset
+        The slice, as read by `pydicom.dcmread` from a file (the pixel
+        data itself need not be read, e.g., `stop_before_pixels=True`).
+
+    Return
+    ------
+    layout: `PixelLayout` or None
+        The byte offset and dtype of the pixel data in the file, and the
+        `Rows`, `Columns` and `BitsStored` of the slice. None if the pixel
+        data cannot be memory-mapped (compressed or big-endian transfer
+        syntax, multi-frame or color images, pixel data not at the end
+        of the file, ...).
+    """
+    path = getattr(dataset, 'filename', None)
+    meta = getattr(dataset, 'file_meta', None)
+    if not isinstance(path, str) or meta is None:
+        return None
+
+    syntax = meta.get('TransferSyntaxUID', None)
+    if syntax not in (_implicit_little, _explicit_little):
+        return None
+
+    try:
+        bits = int(dataset.BitsAllocated)
+        bits_stored = int(dataset.BitsStored)
+        signed = int(dataset.PixelRepresentation) == 1
+        rows, cols = int(dataset.Rows), int(dataset.Columns)
+        if int(dataset.SamplesPerPixel) != 1 or \
+           int(dataset.get('NumberOfFrames', 1) or 1) != 1 or \
+           bits not in (8, 16, 32) or \
+           not 0 < bits_stored <= bits or \
+           dataset.PhotometricInterpretation not in ('MONOCHROME1',
+                                                     'MONOCHROME2'):
+            return None
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+    dtype = '<%s%d' % ('i' if signed else 'u', bits // 8)
+    nbytes = rows * cols * (bits // 8)
+
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            # The value is padded to an even length if need be.
+            for pad in sorted(set([0, nbytes % 2])):
+                offset = size - nbytes - pad
+                if _is_pixel_data_element(f, offset, nbytes + pad,
+                                          syntax == _implicit_little):
+                    return PixelLayout(offset, dtype, rows, cols,
+                                       bits_stored)
+    except (IOError, OSError, struct.error):
+        pass
+    return None
+
+
+def memmap_pixels(path, layout):
+    """
+    Return a read-only `np.memmap` of shape (rows, cols) over the pixel
+    data of a slice, given its `PixelLayout`. The values are the stored
+    values, see `slice_pixels`.
+    """
+    return np.memmap(path, dtype=layout.dtype, mode='r',
+                     offset=layout.offset, shape=(layout.rows, layout.cols))
+
+
+def _correct_unused_bits(pixels, bits_stored):
+    nbits = pixels.dtype.itemsize * 8
+    if bits_stored == nbits:
+        return pixels
+    if pixels.dtype.kind == 'i':
+        shift = nbits - bits_stored
+        return (pixels << shift) >> shift
+    return pixels & ((1 << bits_stored) - 1)
+
+
+def slice_pixels(image, window=None):
+    """
+    Return the pixel array of a DICOM slice, equal to
+    `image.pixel_array[window]`.
+
+    Parameters
+    ----------
+    image: pydicom Dataset or `pylidc.dicom_catalog.SliceRecord`
+        The slice. Catalog records must have a pixel layout.
+
+    window: pair of `slice` objects, default=None
+        The in-plane crop.
+
+    Return
+    ------
+    pixels: ndarray
+        A read-only memory-mapped view into the file when possible,
+        otherwise the array decoded by pydicom.
+    """
+    if hasattr(image, 'pixel_offset'):
+        path = image.path
+        layout = PixelLayout(image.pixel_offset, image.pixel_dtype,
+                             image.rows, image.cols, image.bits_stored)
+    else:
+        path = image.filename
+        layout = pixel_layout(image)
+        if layout is None:
+            pixels = image.pixel_array
+            return pixels if window is None else pixels[window]
+
+    pixels = memmap_pixels(path, layout)
+    if window is not None:
+        pixels = pixels[window]
+    if _corrects_unused_bits:
+        pixels = _correct_unused_bits(pixels, layout.bits_stored)
+    return pixels
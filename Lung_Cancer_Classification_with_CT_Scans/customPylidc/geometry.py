@@ -0,0 +1,388 @@
+"""
+Numerical geometry of contours, masks and regular grids, shared by the
+`Annotation` methods and their cohort-wide versions in `pylidc.batch`.
+
+The contours of an annotation are given as one array `ij` of their
+stacked vertices and the number of vertices `counts` of each contour,
+so that every function works on all the contours at once.
+"""
+import numpy as np
+
+
+def get_marching_cubes():
+    """Return `skimage.measure.marching_cubes` (imported lazily)."""
+    try:
+        from skimage.measure import marching_cubes
+    except ImportError:
+        # Old version compatible since marching_cubes replaced with marchin_cubes_lewiner in skimage 0.19.0
+        from skimage.measure import marching_cubes_lewiner as marching_cubes
+    return marching_cubes
+
+
+def fill_polygons(polygons, origin, shape):
+    """
+    Even-odd fill of closed polygons over a grid of integer points.
+
+    The grid points are `origin + (i, j)` for `0 <= i < shape[0]` and
+    `0 <= j < shape[1]`. Each polygon is an (m,2) array of integer
+    vertices, closed by the edge from the last vertex back to the first.
+    The crossing test is the one of `matplotlib.path.Path.contains_points`
+    (with `radius=0`), evaluated exactly, so that points on the boundary
+    are classified identically.
+
+    All the polygons are filled at once: for every edge and every grid
+    row it crosses, the last point of the row toggled by the ray test is
+    computed, and the parity along each row is then a cumulative sum.
+
+    Return
+    ------
+    inside: ndarray of bools, shape=(len(polygons),) + shape
+    """
+    ni, nj = [int(n) for n in shape]
+    i0, j0 = [int(o) for o in origin]
+    npoly = len(polygons)
+    if npoly == 0 or ni == 0 or nj == 0:
+        return np.zeros((npoly, ni, nj), dtype=bool)
+
+    counts = np.array([len(p) for p in polygons])
+    ends = np.cumsum(counts)[counts > 0]
+    v0 = np.concatenate([np.asarray(p).reshape(-1, 2) for p in polygons])
+    v0 = v0.astype(np.int64)
+    # The next vertex of each vertex, wrapping around in each polygon.
+    nxt = np.arange(1, len(v0) + 1)
+    nxt[ends - 1] = ends - counts[counts > 0]
+    v1 = v0[nxt]
+    pid = np.repeat(np.arange(npoly), counts)
+
+    # An edge crosses the rows lo <= y <= hi (the matplotlib test
+    # compares `y >= ty` at both ends).
+    y0, y1 = v0[:,1], v1[:,1]
+    lo = np.maximum(np.minimum(y0, y1) + 1, j0)
+    hi = np.minimum(np.maximum(y0, y1), j0 + nj - 1)
+    nrows = np.maximum(hi - lo + 1, 0)
+
+    e  = np.repeat(np.arange(len(v0)), nrows)
+    ty = lo[e] + np.arange(e.shape[0]) - np.repeat(np.cumsum(nrows) - nrows,
+                                                   nrows)
+    x0, y0, x1, y1 = v0[e,0], v0[e,1], v1[e,0], v1[e,1]
+
+    # matplotlib toggles the point (tx, ty) if
+    #   ((y1-ty)*(x0-x1) >= (x1-tx)*(y0-y1)) == (y1 >= ty),
+    # i.e., if tx*dy <= num for upward edges (dy > 0), and if
+    # tx*dy > num for downward ones: the points up to `last` in the row.
+    dy  = y1 - y0
+    num = x1*dy + (y1 - ty)*(x0 - x1)
+    last = np.where(dy > 0, num // dy, -(-num // dy) - 1)
+    last = np.clip(last - i0 + 1, 0, ni)
+
+    flat = (pid[e]*nj + (ty - j0))*(ni + 1) + last
+    toggles = np.bincount(flat, minlength=npoly*nj*(ni + 1))
+    toggles = toggles.reshape(npoly, nj, ni + 1)[:,:,::-1]
+    inside = (np.cumsum(toggles, axis=2)[:,:,::-1][:,:,1:] & 1).astype(bool)
+    return inside.transpose(0, 2, 1)
+
+
+def _line_extremes(group, a, b):
+    """
+    Flag the points with the smallest or the largest `b` among the
+    points of the same `group` and `a` (e.g., the ends of each row of
+    each contour). Repeated points are all flagged.
+    """
+    a = a - a.min()
+    b = b - b.min()
+    line = group*(a.max() + 1) + a
+    order = np.argsort(line*(b.max() + 1) + b)
+    line, b = line[order], b[order]
+
+    starts = np.ones(len(line), dtype=bool)
+    starts[1:] = line[1:] != line[:-1]
+    first = np.nonzero(starts)[0]
+    last = np.append(first[1:], len(line)) - 1
+    which = np.cumsum(starts) - 1
+
+    keep = np.zeros(len(line), dtype=bool)
+    keep[order] = (b == b[first][which]) | (b == b[last][which])
+    return keep
+
+
+def max_chords(ij, counts, spacing):
+    """
+    The greatest distance between two points of each contour.
+
+    The two points realizing the greatest distance of a point set are
+    vertices of its convex hull, and a hull vertex is at an end of both
+    its row and its column. Only these points are kept, and the squared
+    distances between all their pairs are then computed at once for
+    contours grouped by (padded) size. The result is the maximum of
+    `pdist` on each contour, exactly.
+
+    Parameters
+    ----------
+    ij: ndarray, shape=(npoints,2)
+        The (i,j) coordinates of all the contours, concatenated.
+
+    counts: ndarray of ints, shape=(ncontours,)
+        The number of points of each contour.
+
+    spacing: float or ndarray, shape=(ncontours,)
+        The pixel spacing of each contour.
+
+    Return
+    ------
+    chords: ndarray, shape=(ncontours,)
+        The greatest distance of each contour, -inf for contours of a
+        single point.
+    """
+    counts = np.asarray(counts, dtype=np.intp)
+    spacing = np.broadcast_to(np.asarray(spacing, dtype=float), counts.shape)
+    chords = np.full(counts.shape, -np.inf)
+    if counts.sum() == 0:
+        return chords
+
+    ij = np.asarray(ij).astype(np.int64)
+    cid = np.repeat(np.arange(len(counts)), counts)
+    keep = _line_extremes(cid, ij[:,0], ij[:,1]) & \
+           _line_extremes(cid, ij[:,1], ij[:,0])
+    order = np.nonzero(keep)[0]
+    ij = ij[order]
+    counts = np.where(counts > 1, np.bincount(cid[order],
+                                              minlength=len(counts)), 1)
+    starts = np.cumsum(counts) - counts
+
+    # Pad each contour to a multiple of 16 points by repeating its last
+    # point, which does not change its greatest distance.
+    sizes = 16*((counts + 15) // 16)
+    for m in np.unique(sizes[counts > 1]):
+        group = np.nonzero((sizes == m) & (counts > 1))[0]
+        # Bound the size of the (contours, m, m) distance arrays.
+        step = max(1, 2**20 // (m*m))
+        for b in range(0, len(group), step):
+            cs = group[b:b+step]
+            idx = starts[cs,None] + np.minimum(np.arange(m), counts[cs,None]-1)
+            P = ij[idx] * spacing[cs,None,None]
+            dx = P[:,:,None,0] - P[:,None,:,0]
+            dy = P[:,:,None,1] - P[:,None,:,1]
+            chords[cs] = np.sqrt((dx*dx + dy*dy).max(axis=(1,2)))
+    return chords
+
+
+def _contour_edges(ij, counts, spacing):
+    """
+    The scaled coordinates of all the contour points, those of the
+    previous point of each point (wrapping around in each contour), and
+    the index of the first point of each non-empty contour.
+    """
+    counts = np.asarray(counts, dtype=np.intp)
+    spacing = np.broadcast_to(np.asarray(spacing, dtype=float), counts.shape)
+    cid = np.repeat(np.arange(len(counts)), counts)
+    xy  = np.asarray(ij, dtype=float) * spacing[cid,None]
+
+    starts = (np.cumsum(counts) - counts)[counts > 0]
+    prev = np.arange(-1, len(xy) - 1)
+    prev[starts] = starts + counts[counts > 0] - 1
+    return xy, xy[prev], starts
+
+
+def shoelace_areas(ij, counts, spacing):
+    """
+    The area of each contour by the shoelace formula (see
+    `Annotation.volume`), with the parameters of `polygon_measures`.
+    """
+    counts = np.asarray(counts, dtype=np.intp)
+    areas = np.zeros(len(counts))
+    if counts.sum() == 0:
+        return areas
+
+    xy, prev, starts = _contour_edges(ij, counts, spacing)
+    cross = xy[:,0]*prev[:,1] - xy[:,1]*prev[:,0]
+    areas[counts > 0] = 0.5*np.abs(np.add.reduceat(cross, starts))
+    return areas
+
+
+def polygon_measures(ij, counts, spacing):
+    """
+    The perimeter and the (shoelace formula) area of each contour.
+
+    Parameters
+    ----------
+    ij: ndarray, shape=(npoints,2)
+        The (i,j) coordinates of all the contours, concatenated.
+
+    counts: ndarray of ints, shape=(ncontours,)
+        The number of points of each contour.
+
+    spacing: float or ndarray, shape=(ncontours,)
+        The pixel spacing of each contour.
+
+    Return
+    ------
+    perimeters, areas: ndarrays, shape=(ncontours,)
+    """
+    counts = np.asarray(counts, dtype=np.intp)
+    perimeters = np.zeros(len(counts))
+    if counts.sum() == 0:
+        return perimeters, np.zeros(len(counts))
+
+    xy, prev, starts = _contour_edges(ij, counts, spacing)
+    lengths = np.hypot(xy[:,0] - prev[:,0], xy[:,1] - prev[:,1])
+    perimeters[counts > 0] = np.add.reduceat(lengths, starts)
+    return perimeters, shoelace_areas(ij, counts, spacing)
+
+
+def slab_thicknesses(zs, ncontours, thickness):
+    """
+    The thickness of the slab of each contour in `Annotation.volume`,
+    for the contours of many annotations at once.
+
+    Parameters
+    ----------
+    zs: ndarray, shape=(ncontours.sum(),)
+        The `image_z_position` of the contours, grouped by annotation.
+
+    ncontours: ndarray of ints
+        The number of contours of each annotation.
+
+    thickness: ndarray, shape=ncontours.shape
+        The slice thickness of the scan of each annotation, used for
+        annotations with a single contour slice.
+
+    Return
+    ------
+    slabs: ndarray, shape=zs.shape
+    """
+    zs = np.asarray(zs, dtype=float)
+    aid = np.repeat(np.arange(len(ncontours)), ncontours)
+
+    # The distinct (annotation, z) slices, sorted.
+    order = np.lexsort((zs, aid))
+    za, zz = aid[order], zs[order]
+    first = np.ones(len(zz), dtype=bool)
+    first[1:] = (za[1:] != za[:-1]) | (zz[1:] != zz[:-1])
+    slice_of = np.cumsum(first) - 1
+    ua, uz = za[first], zz[first]
+
+    # The z-values of the slices below and above each slice, the end
+    # slices being padded by the distance to their neighbour.
+    below = np.full(len(uz), np.nan)
+    above = np.full(len(uz), np.nan)
+    same = ua[1:] == ua[:-1]
+    below[1:][same]  = uz[:-1][same]
+    above[:-1][same] = uz[1:][same]
+    below = np.where(np.isnan(below), 2*uz - above, below)
+    above = np.where(np.isnan(above), 2*uz - below, above)
+
+    slabs = 0.5*(above - below)
+    single = np.isnan(slabs)
+    slabs[single] = np.asarray(thickness, dtype=float)[ua[single]]
+
+    out = np.empty(len(zs))
+    out[order] = slabs[slice_of]
+    return out
+
+
+# The triangles of the marching cubes mesh of each of the 256 binary
+# 2x2x2 configurations on the unit grid, as the configuration and the
+# cross product of two edges of each triangle (see `_cube_area_table`).
+_cube_triangles = None
+
+
+def _cube_area_table(spacing):
+    """
+    The area of the marching cubes mesh of each binary 2x2x2
+    configuration for a given voxel spacing.
+    """
+    global _cube_triangles
+    if _cube_triangles is None:
+        marching_cubes = get_marching_cubes()
+        cases, normals = [], []
+        bits = np.arange(8)
+        # Configurations 0 and 255 have no surface.
+        for case in range(1, 255):
+            cube = ((case >> bits) & 1).reshape(2,2,2).astype(np.float32)
+            verts, faces, _, _ = marching_cubes(cube, 0.5)
+            a, b, c = (verts[faces[:,n]].astype(float) for n in range(3))
+            normals.append(np.cross(b - a, c - a))
+            cases.append(np.full(len(faces), case))
+        _cube_triangles = np.concatenate(cases), np.vstack(normals)
+
+    # Scaling the axes by s scales the cross product of two edges by
+    # (s[1]*s[2], s[0]*s[2], s[0]*s[1]).
+    cases, normals = _cube_triangles
+    si, sj, sk = [float(s) for s in spacing]
+    areas = 0.5*np.linalg.norm(normals * [sj*sk, si*sk, si*sj], axis=1)
+    return np.bincount(cases, weights=areas, minlength=256)
+
+
+def mask_surface_area(mask, spacing):
+    """
+    The area of the marching cubes mesh (at level 0.5) of a boolean
+    volume padded with zeros.
+
+    On binary data, every mesh vertex lies at the middle of a cube edge,
+    so the triangles of a cube only depend on which of its 8 corners are
+    set. The area is then the sum, over all the cubes, of the area of
+    their configuration.
+    """
+    padded = np.zeros(np.add(mask.shape, 2), dtype=np.uint8)
+    padded[1:-1,1:-1,1:-1] = mask
+
+    ni, nj, nk = np.subtract(padded.shape, 1)
+    case = np.zeros((ni, nj, nk), dtype=np.uint8)
+    bit = 0
+    for di in (0, 1):
+        for dj in (0, 1):
+            for dk in (0, 1):
+                case |= padded[di:di+ni, dj:dj+nj, dk:dk+nk] << bit
+                bit += 1
+
+    counts = np.bincount(case.ravel(), minlength=256)
+    return float(np.dot(counts, _cube_area_table(spacing)))
+
+
+def linear_weights(grid, x):
+    """
+    The interval `grid[i] <= x < grid[i+1]` of each of the points `x` in
+    an increasing `grid`, the relative position `w` of the points in it,
+    and whether they are out of the bounds of the grid. These are the
+    indices and weights of the linear
+    `scipy.interpolate.RegularGridInterpolator`.
+    """
+    x = np.asarray(x, dtype=float)
+    i = np.searchsorted(grid, x, side='right') - 1
+    i = np.clip(i, 0, len(grid)-2)
+    w = (x - grid[i]) / (grid[i+1] - grid[i])
+    return i, w, (x < grid[0]) | (x > grid[-1])
+
+
+def interp_axis(values, i, w, axis):
+    """
+    Linearly interpolate `values` along `axis` at the points with
+    interval indices `i` and weights `w` (see `linear_weights`).
+
+    Boolean `values` give whether the interpolated value is positive.
+    """
+    shape = [1]*values.ndim
+    shape[axis] = -1
+    lo = np.take(values, i, axis=axis)
+    hi = np.take(values, i+1, axis=axis)
+    if values.dtype == bool:
+        return (lo & (1-w > 0).reshape(shape)) | (hi & (w > 0).reshape(shape))
+    w = w.astype(values.dtype).reshape(shape)
+    return (1-w)*lo + w*hi
+
+
+def grid_axes(ix, iy, iz):
+    """
+    Return the axes `(x, y, z)` if the points are their
+    `np.meshgrid(x, y, z, indexing='ij')`, otherwise None.
+    """
+    ix, iy, iz = np.asarray(ix), np.asarray(iy), np.asarray(iz)
+    if ix.ndim != 3 or not (ix.shape == iy.shape == iz.shape) or \
+       ix.size == 0:
+        return None
+    x, y, z = ix[:,0,0], iy[0,:,0], iz[0,0,:]
+    if (ix == x[:,None,None]).all() and \
+       (iy == y[None,:,None]).all() and \
+       (iz == z[None,None,:]).all():
+        return x, y, z
+    return None
@@ -0,0 +1,200 @@
+"""
+A process-wide, size-bounded cache of decoded scan volumes.
+
+`Scan.to_volume` is called by many methods (`Scan.visualize`,
+`Annotation.visualize_in_scan`, ...), so that the same series may be
+decoded many times in an interactive session. When the cache is enabled,
+the volumes are kept in a least recently used cache keyed by
+`Scan.series_instance_uid`, bounded by their total number of bytes.
+
+The cache is disabled by default, so that batch jobs (e.g., over
+`pylidc.iter_scans`) keep a bounded memory use. Enable it for a block of
+code with the `image_cache` context manager, or for the whole process
+with `configure_image_cache`.
+
+The cached volumes are read-only and never handed out: every call
+returns a private copy, so that callers can modify it freely.
+
+Example
+-------
+An example::
+
+    import pylidc as pl
+
+    scan = pl.query(pl.Scan).first()
+
+    with pl.image_cache(budget=4 * 1024**3):
+        vol = scan.to_volume()      # Read from the DICOM files.
+        vol = scan.to_volume()      # A copy of the cached volume.
+        print(pl.image_cache_info())
+
+    # Or for the rest of the process.
+    pl.configure_image_cache(budget=2 * 1024**3)
+"""
+import threading
+import contextlib
+from collections import OrderedDict
+
+import numpy as np
+
+# The default size of the cache, in bytes.
+default_budget = 2 * 1024**3
+
+
+class LRUCache(object):
+    """
+    A thread-safe least recently used cache bounded by the total size
+    (in bytes, as given to `put`) of its values.
+
+    Parameters
+    ----------
+    budget: int
+        The maximum total size of the cached values, in bytes.
+    """
+    def __init__(self, budget):
+        self.budget = int(budget)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "LRUCache(budget=%d,size=%d)" % (self.budget, self._size)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """Return the value cached for `key`, or None."""
+        with self._lock:
+            try:
+                value, _ = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, nbytes):
+        """
+        Cache `value` (of size `nbytes`) for `key`, evicting the least
+        recently used values as needed. Values larger than the budget
+        are not cached.
+        """
+        with self._lock:
+            self._pop(key)
+            if nbytes > self.budget:
+                return
+            self._items[key] = (value, nbytes)
+            self._size += nbytes
+            self._evict()
+
+    def resize(self, budget):
+        """Change the budget, evicting values as needed."""
+        with self._lock:
+            self.budget = int(budget)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.budget:
+            self._pop(next(iter(self._items)))
+            self.evictions += 1
+
+    def _pop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= item[1]
+
+    def discard(self, key):
+        """Remove `key` from the cache, if present."""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """Remove all the cached values."""
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def info(self):
+        """
+        Return the cache statistics as a dictionary with keys `hits`,
+        `misses`, `evictions`, `count`, `size` and `budget` (in bytes).
+        """
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses,
+                        evictions=self.evictions, count=len(self._items),
+                        size=self._size, budget=self.budget)
+
+
+_cache = LRUCache(default_budget)
+_enabled = False
+_state_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Return the cache in use, or None if caching is disabled."""
+    return _cache if _enabled else None
+
+
+def configure_image_cache(budget=default_budget, enabled=True):
+    """
+    Enable the image cache (it is disabled by default) and set its size,
+    keeping what fits in it, or disable it.
+
+    Parameters
+    ----------
+    budget: int, default=2 GB
+        The maximum size of the cached volumes, in bytes.
+
+    enabled: bool, default=True
+        Turn the cache on/off.
+    """
+    global _enabled
+    with _state_lock:
+        _cache.resize(budget)
+        _enabled = bool(enabled)
+
+
+@contextlib.contextmanager
+def image_cache(budget=None, enabled=True):
+    """
+    Context manager that scopes the image cache: inside the block, a
+    new, empty cache (of size `budget`, defaulting to the current one)
+    is used, or none if `enabled` is False. The previous cache is
+    restored on exit.
+    """
+    global _cache, _enabled
+    with _state_lock:
+        previous = _cache, _enabled
+        budget = _cache.budget if budget is None else budget
+        _cache, _enabled = LRUCache(budget), bool(enabled)
+    try:
+        yield _cache if _enabled else None
+    finally:
+        with _state_lock:
+            _cache, _enabled = previous
+
+
+def image_cache_info():
+    """
+    Return the statistics of the image cache (see `LRUCache.info`),
+    or None if it is disabled.
+    """
+    cache = get_image_cache()
+    return None if cache is None else cache.info()
+
+
+def clear_image_cache():
+    """Empty the image cache."""
+    _cache.clear()
+
+
+def freeze(array):
+    """Flag `array` read-only (it is cached) and return it."""
+    if isinstance(array, np.ndarray):
+        array.setflags(write=False)
+    return array
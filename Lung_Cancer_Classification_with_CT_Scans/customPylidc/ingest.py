@@ -0,0 +1,32 @@
+"""
+Command line ingestion of LIDC-IDRI scans into the chunked volume store
+(see `pylidc.volume_store`)::
+
+    python -m customPylidc.ingest LIDC-IDRI-0078 LIDC-IDRI-0101
+
+Without patient ids, the whole cohort is ingested.
+"""
+import argparse
+
+from .volume_store import ingest, default_chunks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ingest LIDC-IDRI scans into a chunked volume store.")
+    parser.add_argument('patient_ids', nargs='*',
+                        help="patients to ingest (default: all)")
+    parser.add_argument('--path', default=None,
+                        help="store directory (default: in the pylidc cache)")
+    parser.add_argument('--chunks', type=int, nargs=3,
+                        default=list(default_chunks))
+    parser.add_argument('--compresslevel', type=int, default=6)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args(argv)
+
+    ingest(args.patient_ids or None, path=args.path, chunks=args.chunks,
+           compresslevel=args.compresslevel, overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+    main()
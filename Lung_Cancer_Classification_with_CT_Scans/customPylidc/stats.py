@@ -0,0 +1,132 @@
+"""
+Cohort statistics computed on the database side.
+
+Each function runs a single `GROUP BY` / `COUNT` SQL statement and
+returns the result as a pandas DataFrame, instead of materializing every
+Scan or Annotation object with `.all()` and counting in Python.
+
+Example
+-------
+An example::
+
+    from pylidc import stats
+
+    print(stats.cohort_summary())
+    #    n_patients  n_scans  n_annotations  n_contours
+    # 0        1010     1018           6859       41406
+
+    spp = stats.scans_per_patient()
+    print(spp[spp.n_scans > 1])
+"""
+import pandas as pd
+import sqlalchemy as sq
+
+from .Scan import Scan
+from .Annotation import Annotation, feature_names
+from .Contour import Contour
+
+
+def _to_frame(stmt):
+    from . import get_session
+    result = get_session().execute(stmt)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def cohort_summary():
+    """
+    Return a one-row DataFrame with the number of distinct patients,
+    scans, annotations and contours in the database.
+    """
+    stmt = sq.select(
+        sq.select(sq.func.count(sq.distinct(Scan.patient_id)))
+          .scalar_subquery().label('n_patients'),
+        sq.select(sq.func.count(Scan.id))
+          .scalar_subquery().label('n_scans'),
+        sq.select(sq.func.count(Annotation.id))
+          .scalar_subquery().label('n_annotations'),
+        sq.select(sq.func.count(Contour.id))
+          .scalar_subquery().label('n_contours'))
+    return _to_frame(stmt)
+
+
+def scans_per_patient():
+    """
+    Return a DataFrame with columns `patient_id` and `n_scans`, sorted
+    by `patient_id`.
+    """
+    stmt = sq.select(Scan.patient_id,
+                     sq.func.count(Scan.id).label('n_scans'))\
+             .group_by(Scan.patient_id)\
+             .order_by(Scan.patient_id)
+    return _to_frame(stmt)
+
+
+def annotations_per_scan():
+    """
+    Return a DataFrame with columns `scan_id`, `patient_id` and
+    `n_annotations` (scans without annotations have a count of 0),
+    sorted by `scan_id`.
+    """
+    stmt = sq.select(Scan.id.label('scan_id'), Scan.patient_id,
+                     sq.func.count(Annotation.id).label('n_annotations'))\
+             .select_from(Scan)\
+             .outerjoin(Annotation, Annotation.scan_id == Scan.id)\
+             .group_by(Scan.id, Scan.patient_id)\
+             .order_by(Scan.id)
+    return _to_frame(stmt)
+
+
+def contours_per_annotation():
+    """
+    Return a DataFrame with columns `annotation_id`, `scan_id`,
+    `n_contours`, `n_inclusion` and `n_exclusion`, sorted by
+    `annotation_id`.
+    """
+    n_inclusion = sq.func.coalesce(sq.func.sum(
+                    sq.case((Contour.inclusion == sq.true(), 1), else_=0)), 0)
+    stmt = sq.select(Annotation.id.label('annotation_id'),
+                     Annotation.scan_id,
+                     sq.func.count(Contour.id).label('n_contours'),
+                     n_inclusion.label('n_inclusion'),
+                     (sq.func.count(Contour.id) - n_inclusion)
+                        .label('n_exclusion'))\
+             .select_from(Annotation)\
+             .outerjoin(Contour, Contour.annotation_id == Annotation.id)\
+             .group_by(Annotation.id, Annotation.scan_id)\
+             .order_by(Annotation.id)
+    return _to_frame(stmt)
+
+
+def feature_histograms(features=feature_names):
+    """
+    Return the value counts of the semantic annotation features.
+
+    Parameters
+    ----------
+    features: iterable of strings, default=`pylidc.annotation_feature_names`
+        The features to count.
+
+    Return
+    ------
+    hist: DataFrame
+        A long-format DataFrame with columns `feature`, `value` and
+        `count`, sorted by feature and value. Use
+        `hist.pivot(index='value', columns='feature', values='count')`
+        for a wide table.
+    """
+    features = list(features)
+    for f in features:
+        if f not in feature_names:
+            raise ValueError("Invalid feature: %s. Available features are: %s"
+                             % (f, list(feature_names)))
+
+    selects = []
+    for f in features:
+        col = getattr(Annotation, f)
+        selects.append(sq.select(sq.literal(f).label('feature'),
+                                 col.label('value'),
+                                 sq.func.count().label('count'))
+                         .group_by(col))
+
+    stmt = sq.union_all(*selects).order_by('feature', 'value')
+    return _to_frame(stmt)
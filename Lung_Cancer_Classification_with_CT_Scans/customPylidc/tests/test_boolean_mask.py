@@ -0,0 +1,104 @@
+"""
+Equivalence of the scanline fill of `Annotation.boolean_mask`
+(`fill_polygons`) with the `matplotlib.path.Path.contains_points` test
+it replaced, on real annotations and on degenerate contours.
+"""
+import numpy as np
+import pytest
+import matplotlib.path as mplpath
+
+import customPylidc as pl
+from customPylidc.geometry import fill_polygons
+from customPylidc.benchmarks._reference import previous_boolean_mask
+
+
+def path_fill(vertices, origin, shape):
+    """`Path.contains_points` over the grid, as in `boolean_mask`."""
+    C = np.asarray(vertices)
+    if (C[0] != C[-1]).any():
+        C = np.append(C, C[0].reshape(1,2), axis=0)
+    ii, jj = np.indices(shape)
+    points = np.asarray(origin) + np.c_[ii.ravel(), jj.ravel()]
+    return mplpath.Path(C, closed=True).contains_points(points)\
+                                       .reshape(shape)
+
+
+def scanline_fill(vertices, origin, shape):
+    """`fill_polygons` on one contour, closed as in `boolean_mask`."""
+    C = np.asarray(vertices)
+    if (C[0] != C[-1]).any():
+        C = np.append(C, C[0].reshape(1,2), axis=0)
+    return fill_polygons([C[:-1]], origin, shape)[0]
+
+
+degenerate_contours = {
+    'single point':        [(5, 5)],
+    'two points':          [(2, 3), (7, 3)],
+    'collinear':           [(1, 1), (4, 4), (8, 8), (3, 3)],
+    'single row':          [(4, 1), (4, 6), (4, 9)],
+    'single column':       [(1, 4), (6, 4), (9, 4)],
+    'closed square':       [(2, 2), (2, 8), (8, 8), (8, 2), (2, 2)],
+    'repeated vertices':   [(2, 2), (2, 2), (2, 8), (8, 8), (8, 8), (8, 2)],
+    'bow tie':             [(2, 2), (8, 8), (2, 8), (8, 2)],
+    'touching edges':      [(1, 1), (1, 9), (5, 5), (9, 9), (9, 1), (5, 5)],
+    'spike':               [(2, 2), (2, 8), (5, 8), (5, 12), (5, 8),
+                            (8, 8), (8, 2)],
+    'horizontal edges':    [(2, 2), (2, 5), (4, 5), (4, 7), (2, 7),
+                            (2, 9), (8, 9), (8, 2)],
+    'outside of the grid': [(-3, -3), (-3, 4), (4, 4), (4, -3)],
+}
+
+
+@pytest.mark.parametrize('name', sorted(degenerate_contours))
+@pytest.mark.parametrize('origin', [(0, 0), (1, 2), (-2, -1)])
+def test_degenerate_contours(name, origin):
+    vertices = degenerate_contours[name]
+    shape = (12, 14)
+    np.testing.assert_array_equal(scanline_fill(vertices, origin, shape),
+                                  path_fill(vertices, origin, shape))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_random_contours(seed):
+    # Few distinct coordinates make vertices and edges coincide with grid
+    # points, rows and each other.
+    rng = np.random.default_rng(seed)
+    vertices = rng.integers(0, 10, size=(rng.integers(1, 12), 2))
+    shape = (10, 10)
+    np.testing.assert_array_equal(scanline_fill(vertices, (0, 0), shape),
+                                  path_fill(vertices, (0, 0), shape))
+
+
+def test_many_contours_at_once():
+    rng = np.random.default_rng(0)
+    polygons = [rng.integers(0, 16, size=(n, 2))
+                for n in rng.integers(1, 10, size=40)]
+    inside = fill_polygons(polygons, (0, 0), (16, 16))
+    for C, filled in zip(polygons, inside):
+        np.testing.assert_array_equal(filled, path_fill(C, (0, 0), (16, 16)))
+
+
+def annotation_sample(n=60, seed=0):
+    """Random annotations, plus the ones with the most contours."""
+    ids = [i for i, in pl.query(pl.Annotation.id).order_by(pl.Annotation.id)]
+    rng = np.random.default_rng(seed)
+    sample = set(rng.choice(ids, min(n, len(ids)), replace=False).tolist())
+    anns = pl.query(pl.Annotation).filter(pl.Annotation.id.in_(sample)).all()
+    largest = sorted(pl.query(pl.Annotation).limit(400).all(),
+                     key=lambda ann: -len(ann.contours))[:10]
+    return anns + largest
+
+
+@pytest.fixture(scope='module')
+def annotations():
+    return annotation_sample()
+
+
+@pytest.mark.parametrize('kwargs', [dict(), dict(pad=5),
+                                    dict(include_contour_points=True),
+                                    dict(pad=[(3,1), (0,4), (2,2)])])
+def test_real_annotations(annotations, kwargs):
+    for ann in annotations:
+        np.testing.assert_array_equal(ann.boolean_mask(**kwargs),
+                                      previous_boolean_mask(ann, **kwargs),
+                                      err_msg='Annotation %d' % ann.id)
@@ -0,0 +1,63 @@
+"""
+Property test of the duplicate-z slice pruning of
+`Scan.load_all_dicom_images` (`_unique_slice_order`) against the
+quadratic loop it replaced.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from customPylidc.Scan import _unique_slice_order
+from customPylidc.benchmarks._reference import previous_unique_slice_order
+
+
+def random_series(rng, unique_inums):
+    """Random z positions (with repeats) and InstanceNumbers."""
+    nz = rng.randint(1, 12)
+    positions = [round(rng.uniform(-300, 0), 1) for _ in range(nz)]
+    zs = [rng.choice(positions) for _ in range(rng.randint(1, 25))]
+    if unique_inums:
+        inums = [float(n) for n in rng.sample(range(1, 1000), len(zs))]
+    else:
+        inums = [float(rng.randint(1, 5)) for _ in zs]
+    return zs, inums
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_same_selection_as_previous_loop(seed):
+    rng = random.Random(seed)
+    compared = 0
+    for _ in range(200):
+        zs, inums = random_series(rng, unique_inums=True)
+        try:
+            expected = previous_unique_slice_order(zs, inums)
+        except ValueError:
+            # The previous loop removes from the list it iterates over,
+            # and fails on some inputs with repeated positions.
+            continue
+        assert _unique_slice_order(zs, inums) == expected
+        compared += 1
+    assert compared > 0
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('unique_inums', [True, False])
+def test_keeps_least_instance_number_per_position(seed, unique_inums):
+    rng = random.Random(seed)
+    for _ in range(200):
+        zs, inums = random_series(rng, unique_inums)
+        kept = _unique_slice_order(zs, inums)
+
+        kept_zs = [zs[i] for i in kept]
+        assert kept_zs == sorted(set(zs))
+        for i in kept:
+            same_z = [j for j in range(len(zs)) if zs[j] == zs[i]]
+            # The least InstanceNumber, then the first listed.
+            assert i == min(same_z, key=lambda j: (inums[j], j))
+
+
+def test_no_duplicates():
+    zs = [3.0, 1.0, 2.0]
+    assert _unique_slice_order(zs, [1.0, 2.0, 3.0]) == [1, 2, 0]
+    assert _unique_slice_order([], []) == []
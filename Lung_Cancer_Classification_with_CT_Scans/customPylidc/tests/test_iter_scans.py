@@ -0,0 +1,70 @@
+"""
+`iter_scans`: the scans kept by the caller stay usable once their
+session is closed, and an early exit closes every session it opened.
+"""
+import time
+
+import pytest
+
+import customPylidc as pl
+
+
+patient_ids = ['LIDC-IDRI-0078', 'LIDC-IDRI-0069', 'LIDC-IDRI-0048']
+
+
+def test_scans_usable_after_their_session_closed():
+    scans = list(pl.iter_scans(patient_ids, load_volume=False))
+    assert [scan.patient_id for scan in scans] == patient_ids
+
+    for scan in scans:
+        expected = pl.query(pl.Scan).filter(pl.Scan.id == scan.id).one()
+        assert len(scan.slice_zvals) == len(expected.slice_zvals)
+        for ann, other in zip(scan.annotations, expected.annotations):
+            assert ann.scan is scan
+            assert all(c.annotation is ann for c in ann.contours)
+            assert ann.bbox() == other.bbox()
+            assert ann.diameter == pytest.approx(other.diameter)
+            assert list(ann.centroid) == pytest.approx(list(other.centroid))
+        assert len(scan.cluster_annotations()) \
+            == len(expected.cluster_annotations())
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Record the sessions opened by `iter_scans` and which get closed."""
+    started, opened, closed = [], [], set()
+    load_patient = pl._load_patient
+
+    def slow_load_patient(patient_id, load_volume, volume_kwargs):
+        started.append(patient_id)
+        if patient_id != patient_ids[0]:
+            time.sleep(0.2)
+        session, scans, volumes = load_patient(patient_id, load_volume,
+                                               volume_kwargs)
+        close = session.close
+        def record_close():
+            closed.add(id(session))
+            close()
+        session.close = record_close
+        opened.append(id(session))
+        return session, scans, volumes
+
+    monkeypatch.setattr(pl, '_load_patient', slow_load_patient)
+    return started, opened, closed
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_early_exit_closes_sessions(sessions, ordered):
+    started, opened, closed = sessions
+    scans = pl.iter_scans(patient_ids, prefetch=2, load_volume=False,
+                          ordered=ordered)
+    next(scans)
+    scans.close()
+
+    # The patients still loading are closed once they are done.
+    deadline = time.time() + 10
+    while (len(opened) < len(started) or set(opened) != closed) \
+            and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(opened) >= 2
+    assert set(opened) == closed
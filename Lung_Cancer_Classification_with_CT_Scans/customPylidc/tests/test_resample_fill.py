@@ -0,0 +1,87 @@
+"""
+The value `Annotation.uniform_cubic_resample` pads the CT volume with
+outside of the scan: the minimum stored pixel value of the whole scan
+when the scan is in the volume store, and the value of air otherwise,
+never the minimum of the region around the nodule.
+"""
+import os
+import shutil
+import tempfile
+import importlib
+
+import numpy as np
+import pytest
+
+import customPylidc as pl
+from customPylidc import dicom_catalog, volume_store
+from customPylidc.benchmarks._common import write_series
+
+scan_module = importlib.import_module('customPylidc.Scan')
+
+# The stored pixel values of the synthetic series are `(i + j + n) % 2000`
+# (see `write_series`), so that the scan minimum is 0, while the region
+# around the nodule has larger values. Air is -1024 - intercept = -24.
+intercept = -1000
+
+
+@pytest.fixture(scope='module')
+def root():
+    scan = pl.query(pl.Scan).filter(pl.Scan.patient_id == 'LIDC-IDRI-0078')\
+             .first()
+    root = tempfile.mkdtemp()
+    write_series(os.path.join(root, scan.patient_id, scan.study_instance_uid,
+                              scan.series_instance_uid),
+                 scan.study_instance_uid, scan.series_instance_uid,
+                 scan.slice_zvals, intercept=intercept)
+    yield root
+    shutil.rmtree(root)
+
+
+@pytest.fixture
+def annotation(root, monkeypatch):
+    """An annotation of the scan of the synthetic series."""
+    monkeypatch.setattr(scan_module, '_get_dicom_file_path_from_config_file',
+                        lambda: root)
+    monkeypatch.setattr(dicom_catalog, '_catalog', None)
+    monkeypatch.setattr(volume_store, '_store', None)
+    scan = pl.query(pl.Scan).filter(pl.Scan.patient_id == 'LIDC-IDRI-0078')\
+             .first()
+    return scan.annotations[0]
+
+
+def resample_past_last_slice(ann):
+    """
+    Resample on the slices of the nodule and on positions beyond the
+    last slice of the scan, and return the values at the latter and at
+    the former.
+    """
+    rij = ann.scan.pixel_spacing
+    bb = ann.bbox_matrix()
+    zs = ann.scan.slice_zvals
+    x = np.arange(bb[0,0], bb[0,1]+1) * rij
+    y = np.arange(bb[1,0], bb[1,1]+1) * rij
+    z = np.r_[zs[bb[2,0]:bb[2,1]+1], zs[-1] + 5, zs[-1] + 10]
+    irp_pts = np.meshgrid(x, y, z, indexing='ij')
+    vol, _ = ann.uniform_cubic_resample(verbose=False, irp_pts=irp_pts)
+    return vol[:,:,-2:], vol[:,:,:-2]
+
+
+def test_fill_is_scan_minimum_with_store(annotation, monkeypatch):
+    store_root = tempfile.mkdtemp()
+    try:
+        store = volume_store.ingest(['LIDC-IDRI-0078'], path=store_root,
+                                    verbose=False)
+        monkeypatch.setattr(volume_store, '_store', store)
+        filled, inside = resample_past_last_slice(annotation)
+    finally:
+        shutil.rmtree(store_root)
+
+    assert inside.min() > 0
+    np.testing.assert_array_equal(filled, 0)
+
+
+def test_fill_is_air_without_store(annotation):
+    filled, inside = resample_past_last_slice(annotation)
+
+    assert inside.min() > 0
+    np.testing.assert_array_equal(filled, -1024 - intercept)
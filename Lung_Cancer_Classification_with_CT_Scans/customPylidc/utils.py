@@ -1,9 +1,6 @@
 import numpy as np
 from .Scan import Scan
 from .Annotation import Annotation
-import matplotlib.pyplot as plt
-from skimage.measure import find_contours
-from matplotlib.widgets import Slider
 
 def consensus(anns, clevel=0.5, pad=None, ret_masks=True):
     """Return the boolean-valued consensus volume amongst the
@@ -106,6 +103,10 @@ def volume_viewer(vol, mask=None, axis=2, aspect=None, **line_kwargs):
                       ls='-', lw=2, c='r')
 
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Slider
+    from skimage.measure import find_contours
+
     if vol.ndim !=3:
         raise TypeError("`vol` must be 3d.")
     if axis not in (0,1,2):
@@ -0,0 +1,239 @@
+"""
+An on-disk cache of decoded CT volumes.
+
+Decoding a whole DICOM series takes seconds, and `Scan.to_volume` is
+called by many of the annotation methods. Once the volume cache is
+enabled, `Scan.to_volume` stores each decoded int16 volume as an `.npy`
+file keyed by `Scan.series_instance_uid`, along with a `.json` file of
+metadata (shape, dtype, slice z positions and spacings). Later calls
+return a copy-on-write `np.memmap` of the file, which takes
+milliseconds and only reads the parts of the volume that are used.
+
+The total size of the cached volumes is kept under a disk budget by
+evicting the least recently used volumes.
+
+Example
+-------
+Enable the cache with a 20 GB budget (the cache is disabled by
+default)::
+
+    import pylidc as pl
+
+    pl.configure_volume_cache(budget=20 * 1024**3)
+
+    scan = pl.query(pl.Scan).first()
+    vol = scan.to_volume()   # Decoded, then cached.
+    vol = scan.to_volume()   # Memory-mapped from the cache.
+
+    print(pl.volume_cache_info())
+"""
+import os
+import json
+import time
+
+import numpy as np
+
+# The cache used by `Scan.to_volume`, see `configure_volume_cache`.
+_cache = None
+
+
+class VolumeCache(object):
+    """
+    A directory of memory-mappable volumes with a disk budget and least
+    recently used eviction.
+
+    Parameters
+    ----------
+    path: string
+        The cache directory.
+
+    budget: int
+        The maximum total size of the cached volumes, in bytes.
+    """
+    def __init__(self, path, budget):
+        self.path = path
+        self.budget = int(budget)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def __repr__(self):
+        return "VolumeCache(path=%s,budget=%d)" % (self.path, self.budget)
+
+    def _files(self, key):
+        base = os.path.join(self.path, key)
+        return base + '.npy', base + '.json'
+
+    def entries(self):
+        """
+        Return the cached volumes as a list of `(key, nbytes, last_used)`
+        tuples, least recently used first.
+        """
+        entries = []
+        for fname in os.listdir(self.path):
+            if not fname.endswith('.json'):
+                continue
+            key = fname[:-len('.json')]
+            npy, meta = self._files(key)
+            try:
+                entries.append((key, os.path.getsize(npy),
+                                os.path.getmtime(meta)))
+            except OSError:
+                # Removed by another process in the meantime.
+                continue
+        return sorted(entries, key=lambda e: e[2])
+
+    @property
+    def size(self):
+        """The total size of the cached volumes, in bytes."""
+        return sum(e[1] for e in self.entries())
+
+    def metadata(self, key):
+        """
+        Return the metadata dictionary stored with a volume, or None if
+        it is not cached.
+        """
+        meta = self._files(key)[1]
+        try:
+            with open(meta) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def get(self, key):
+        """
+        Return a copy-on-write memory map of a cached volume (changes to
+        it are not written back), or None if it is not cached.
+        """
+        npy, meta = self._files(key)
+        try:
+            volume = np.load(npy, mmap_mode='c')
+            os.utime(meta, None)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return volume
+
+    def put(self, key, volume, metadata=None):
+        """
+        Store a volume, evicting the least recently used volumes as
+        needed to stay under the budget. Volumes larger than the budget
+        are not stored.
+
+        Return
+        ------
+        stored: bool
+        """
+        volume = np.asarray(volume)
+        if volume.nbytes > self.budget:
+            return False
+
+        self.evict(self.budget - volume.nbytes, keep=key)
+
+        npy, meta = self._files(key)
+        # Write under temporary names and rename, so that concurrent
+        # readers never see a partial file.
+        tmp = '.%s.%d.tmp' % (key, os.getpid())
+        tmp_npy  = os.path.join(self.path, tmp + '.npy')
+        tmp_meta = os.path.join(self.path, tmp + '.json')
+
+        metadata = dict(metadata or {})
+        metadata.update(shape=list(volume.shape), dtype=volume.dtype.str,
+                        created=time.time())
+
+        np.save(tmp_npy, volume)
+        with open(tmp_meta, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_npy, npy)
+        os.replace(tmp_meta, meta)
+        return True
+
+    def remove(self, key):
+        """Remove a volume from the cache."""
+        for fname in self._files(key):
+            if os.path.exists(fname):
+                os.remove(fname)
+
+    def evict(self, size, keep=None):
+        """
+        Remove the least recently used volumes until the total size of
+        the cache is at most `size` bytes. The volume `keep` is not
+        counted nor removed.
+        """
+        entries = [e for e in self.entries() if e[0] != keep]
+        total = sum(e[1] for e in entries)
+        for key, nbytes, _ in entries:
+            if total <= size:
+                break
+            self.remove(key)
+            self.evictions += 1
+            total -= nbytes
+
+    def clear(self):
+        """Remove all the cached volumes."""
+        for key, _, _ in self.entries():
+            self.remove(key)
+
+    def info(self):
+        """
+        Return the cache statistics as a dictionary with keys `hits`,
+        `misses`, `evictions` (counted in this process), `count`, `size`
+        and `budget` (in bytes).
+        """
+        entries = self.entries()
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, count=len(entries),
+                    size=sum(e[1] for e in entries), budget=self.budget)
+
+
+def _get_volume_cache_path():
+    from .Scan import _get_cache_path
+    return os.path.join(_get_cache_path(), 'volumes')
+
+
+def configure_volume_cache(budget=None, path=None):
+    """
+    Enable (or disable) the on-disk volume cache used by
+    `Scan.to_volume`.
+
+    Parameters
+    ----------
+    budget: int, default=None
+        The disk budget in bytes. None disables the cache (the cached
+        files are left on disk). Lowering the budget evicts volumes
+        right away.
+
+    path: string, default=None
+        The cache directory. Defaults to `volumes` in the pylidc cache
+        directory (`~/.pylidc_cache`, or the `PYLIDC_CACHE` environment
+        variable).
+
+    Return
+    ------
+    cache: :class:`VolumeCache` or None
+    """
+    global _cache
+    if budget is None:
+        _cache = None
+        return None
+
+    path = _get_volume_cache_path() if path is None else path
+    _cache = VolumeCache(path, budget)
+    _cache.evict(_cache.budget)
+    return _cache
+
+
+def get_volume_cache():
+    """Return the volume cache in use, or None if it is disabled."""
+    return _cache
+
+
+def volume_cache_info():
+    """
+    Return the statistics of the volume cache (see `VolumeCache.info`),
+    or None if it is disabled.
+    """
+    return None if _cache is None else _cache.info()
@@ -0,0 +1,285 @@
+"""
+A chunked, compressed store of the CT volumes of the whole cohort.
+
+Each series is stored as a single `<SeriesInstanceUID>.npz` file in the
+store directory. The volume is split into int16 chunks (64x64x16 voxels
+by default), each saved as a separately deflate-compressed `.npy`
+member named `c_<ci>_<cj>_<ck>`, next to a `meta` member holding the
+shape, the chunk shape, the slice z positions and spacings of the scan,
+and the minimum value of each slice. Reading a region of a volume only decompresses the chunks it
+touches, and the files can be opened with `numpy.load` alone.
+
+When a store has been built in the default location, `Scan.to_volume`
+reads the volumes (and ROIs, see `Annotation.roi_volume`) from it
+instead of the DICOM files.
+
+Example
+-------
+Ingest the cohort, either from Python::
+
+    from pylidc.volume_store import ingest
+
+    ingest()
+
+or from the command line::
+
+    python -m customPylidc.ingest LIDC-IDRI-0078 LIDC-IDRI-0101
+
+and read regions back::
+
+    import pylidc as pl
+    from pylidc.volume_store import get_volume_store
+
+    store = get_volume_store()
+    ann = pl.query(pl.Annotation).first()
+    roi = store.read(ann.scan.series_instance_uid, ann.bbox(pad=10))
+"""
+import os
+import json
+import zipfile
+import threading
+
+import numpy as np
+
+default_chunks = (64, 64, 16)
+
+# The store opened by `get_volume_store`. `False` means "not looked up".
+_store = False
+
+
+def _get_store_path():
+    from .Scan import _get_cache_path
+    return os.path.join(_get_cache_path(), 'volume_store')
+
+
+def write_volume(path, volume, metadata=None, chunks=default_chunks,
+                 compresslevel=6):
+    """
+    Write a volume as a chunked `.npz` file (see the module
+    documentation).
+
+    Parameters
+    ----------
+    path: string
+        The file to write.
+
+    volume: ndarray, shape=(rows, cols, slices)
+        The volume.
+
+    metadata: dict, default=None
+        Further JSON-serializable metadata stored with the volume.
+
+    chunks: 3-tuple of ints, default=(64, 64, 16)
+        The chunk shape.
+
+    compresslevel: int, default=6
+        The zlib compression level (1 is fastest, 9 smallest).
+    """
+    volume = np.asarray(volume)
+    chunks = tuple(int(c) for c in chunks)
+
+    meta = dict(metadata or {})
+    meta.update(shape=list(volume.shape), chunks=list(chunks),
+                dtype=volume.dtype.str)
+
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=compresslevel) as zf:
+        with zf.open('meta.npy', 'w') as f:
+            np.lib.format.write_array(f, np.array(json.dumps(meta)))
+        grid = [range(0, n, c) for n, c in zip(volume.shape, chunks)]
+        for i in grid[0]:
+            for j in grid[1]:
+                for k in grid[2]:
+                    chunk = volume[i:i+chunks[0], j:j+chunks[1],
+                                   k:k+chunks[2]]
+                    name = 'c_%d_%d_%d.npy' % (i // chunks[0],
+                                               j // chunks[1],
+                                               k // chunks[2])
+                    with zf.open(name, 'w') as f:
+                        np.lib.format.write_array(
+                            f, np.ascontiguousarray(chunk))
+    os.replace(tmp, path)
+
+
+class VolumeStore(object):
+    """
+    Read access to a directory of chunked volume files.
+
+    Parameters
+    ----------
+    path: string
+        The store directory.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "VolumeStore(path=%s)" % self.path
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def _open(self, key):
+        with self._lock:
+            npz = self._files.get(key)
+            if npz is None:
+                npz = np.load(self._file(key))
+                meta = json.loads(str(npz['meta']))
+                npz = self._files[key] = (npz, meta)
+            return npz
+
+    def keys(self):
+        """Return the SeriesInstanceUIDs in the store."""
+        return sorted(f[:-len('.npz')] for f in os.listdir(self.path)
+                      if f.endswith('.npz'))
+
+    def metadata(self, key):
+        """Return the metadata dictionary of a stored volume."""
+        return dict(self._open(key)[1])
+
+    def read(self, key, window=None):
+        """
+        Read a stored volume, or a region of it.
+
+        Parameters
+        ----------
+        key: string
+            The SeriesInstanceUID of the volume.
+
+        window: 3-tuple of slices, default=None
+            The region to read (e.g., `Annotation.bbox()`). Only the
+            chunks that intersect it are decompressed.
+
+        Return
+        ------
+        volume: ndarray
+            Equal to `volume[window]`.
+        """
+        npz, meta = self._open(key)
+        shape, chunks = meta['shape'], meta['chunks']
+        if window is None:
+            window = (slice(None),) * 3
+
+        # The bounding range of each axis is read, and strided (or
+        # reversed) windows are then taken from it.
+        ranges, index = [], []
+        for w, n in zip(window, shape):
+            idx = range(*w.indices(n))
+            lo = min(idx[0], idx[-1]) if len(idx) else 0
+            hi = max(idx[0], idx[-1]) + 1 if len(idx) else 0
+            ranges.append((lo, hi))
+            index.append(None if w.step in (None, 1) else
+                         np.array(idx, dtype=np.intp) - lo)
+
+        out = np.empty([hi - lo for lo, hi in ranges],
+                       dtype=np.dtype(meta['dtype']))
+        grids = [range(lo // c, (hi + c - 1) // c)
+                 for (lo, hi), c in zip(ranges, chunks)]
+        for ci in grids[0]:
+            for cj in grids[1]:
+                for ck in grids[2]:
+                    chunk = npz['c_%d_%d_%d' % (ci, cj, ck)]
+                    src, dst = [], []
+                    for c, (lo, hi), n in zip((ci, cj, ck), ranges, chunks):
+                        a, b = max(lo, c*n), min(hi, (c+1)*n)
+                        src.append(slice(a - c*n, b - c*n))
+                        dst.append(slice(a - lo, b - lo))
+                    out[tuple(dst)] = chunk[tuple(src)]
+
+        for axis, idx in enumerate(index):
+            if idx is not None:
+                out = np.take(out, idx, axis=axis)
+        return out
+
+    def close(self):
+        """Close the open files."""
+        with self._lock:
+            for npz, _ in self._files.values():
+                npz.close()
+            self._files.clear()
+
+
+def get_volume_store():
+    """
+    Return the store in the default location (opened once per process),
+    or None if it does not exist.
+    """
+    global _store
+    if _store is False:
+        path = _get_store_path()
+        _store = VolumeStore(path) if os.path.isdir(path) else None
+    return _store
+
+
+def ingest(patient_ids=None, path=None, chunks=default_chunks,
+           compresslevel=6, overwrite=False, prefetch=2, verbose=True):
+    """
+    Decode the scans of a list of patients and write them to a volume
+    store.
+
+    Parameters
+    ----------
+    patient_ids: list of strings, default=None
+        The patients to ingest. If None (the default), all of them.
+
+    path: string, default=None
+        The store directory. Defaults to `volume_store` in the pylidc
+        cache directory (`~/.pylidc_cache`, or the `PYLIDC_CACHE`
+        environment variable), which `Scan.to_volume` reads from.
+
+    chunks: 3-tuple of ints, default=(64, 64, 16)
+        The chunk shape.
+
+    compresslevel: int, default=6
+        The zlib compression level.
+
+    overwrite: bool, default=False
+        Re-ingest the series that are already in the store.
+
+    prefetch: int, default=2
+        The number of patients decoded ahead, see `pylidc.iter_scans`.
+
+    verbose: bool, default=True
+        Turn the progress statements on/off.
+
+    Return
+    ------
+    store: :class:`VolumeStore`
+    """
+    global _store
+    from . import iter_scans
+
+    path = _get_store_path() if path is None else path
+    if not os.path.exists(path):
+        os.makedirs(path)
+    store = VolumeStore(path)
+
+    scans = iter_scans(patient_ids, prefetch=prefetch, load_volume=False)
+    for scan in scans:
+        if scan.series_instance_uid in store and not overwrite:
+            continue
+        if verbose: print("Ingesting %s ..." % scan)
+        try:
+            volume = scan.to_volume(verbose=False, cache=False)
+        except (IOError, RuntimeError) as e:
+            if verbose: print("Skipping %s: %s" % (scan, e))
+            continue
+        meta = dict(patient_id=scan.patient_id,
+                    study_instance_uid=scan.study_instance_uid,
+                    series_instance_uid=scan.series_instance_uid,
+                    slice_zvals=[float(z) for z in scan.slice_zvals],
+                    pixel_spacing=scan.pixel_spacing,
+                    slice_spacing=float(scan.slice_spacing),
+                    slice_min=[int(v) for v in volume.min(axis=(0, 1))])
+        write_volume(store._file(scan.series_instance_uid), volume, meta,
+                     chunks=chunks, compresslevel=compresslevel)
+
+    # Drop any previously opened store.
+    _store = False
+    return store